@@ -0,0 +1,100 @@
+# actions.py
+# Одноразові дії з карток адмін-групи.
+#
+# Кожна картка (звіт, оплата) отримує id; у callback_data їде лише він, а
+# подробиці (гравець, тип звіту, стібки) лежать у розділі db["actions"]. Дію
+# застосовують один раз: запис видаляється тим самим записом у БД, що й зміна
+# гравця, а текст результату лишається в пам'яті — повторне натискання чи
+# повторна доставка відповідається звідти, без БД і без Bot API. Картки
+# старші за ttl або понад limit найстаріших закриваються самі.
+import time
+from collections import OrderedDict, deque
+
+CALLBACK_VERSION = "1"      # перший символ токена: формат callback_data
+_WORKER_BITS = 6            # молодші біти id — номер процесу кластера
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _b36(n: int) -> str:
+    out = []
+    while True:
+        n, r = divmod(n, 36)
+        out.append(_DIGITS[r])
+        if not n:
+            return "".join(reversed(out))
+
+
+def token_id(token: str):
+    # id картки з callback_data; None — не наш формат
+    if not token or token[0] != CALLBACK_VERSION:
+        return None
+    try:
+        return int(token[1:], 36)
+    except ValueError:
+        return None
+
+
+class ActionTable:
+    def __init__(self, section, touch, worker: int = 0, ttl: float = 7 * 86400, limit: int = 10000,
+                 done_size: int = 2000):
+        self.section = section      # db["actions"]: str(id) -> {"uid", "card", "at", ...}
+        self.touch = touch          # touch(key) — позначити зміну для save_db()
+        self.worker = worker
+        self.ttl = ttl
+        self.limit = limit
+        self.done_size = done_size
+        self.done = OrderedDict()   # id -> текст результату
+        self.expired = 0
+        self._order = deque()       # видані id за зростанням (id росте з часом)
+        self._last = 0
+
+    def load(self):
+        mask = (1 << _WORKER_BITS) - 1
+        self._order.extend(sorted(aid for aid in map(int, self.section) if aid & mask == self.worker))
+        self.expire()
+
+    def _new_id(self) -> int:
+        # мікросекунди + номер процесу: унікально між процесами й перезапусками
+        stamp = max(time.time_ns() // 1000, (self._last >> _WORKER_BITS) + 1)
+        self._last = stamp << _WORKER_BITS | self.worker
+        return self._last
+
+    def open(self, uid: str, card: str, **payload) -> str:
+        aid = self._new_id()
+        self.section[str(aid)] = {"uid": uid, "card": card, "at": int(time.time()), **payload}
+        self.touch(str(aid))
+        self._order.append(aid)
+        self.expire()
+        return CALLBACK_VERSION + _b36(aid)
+
+    def lookup(self, token: str):
+        """(id, запис, None) — картка відкрита; (id, None, текст) — вже оброблена; None — застаріла."""
+        aid = token_id(token)
+        if aid is None:
+            return None
+        text = self.done.get(aid)
+        if text is not None:
+            return aid, None, text
+        rec = self.section.get(str(aid))
+        # expire() іде лише з open()/load(), тож між ними картка могла застаріти
+        if rec is None or rec.get("at", 0) < time.time() - self.ttl:
+            return None
+        return aid, rec, None
+
+    def close(self, aid: int, result: str):
+        self.section.pop(str(aid), None)
+        self.touch(str(aid))
+        self.done[aid] = result
+        while len(self.done) > self.done_size:
+            self.done.popitem(last=False)
+
+    def expire(self, now: float = None):
+        cutoff = int(((now or time.time()) - self.ttl) * 1_000_000)
+        while self._order and (len(self._order) > self.limit or self._order[0] >> _WORKER_BITS < cutoff):
+            key = str(self._order.popleft())
+            if self.section.pop(key, None) is not None:
+                self.touch(key)
+                self.expired += 1
+
+    def stats(self) -> dict:
+        return {"issued": len(self._order), "done_cached": len(self.done), "expired": self.expired}
@@ -0,0 +1,87 @@
+# bench/bench_catalog.py
+# Пропускна здатність "🎯 Завдання" та кидка кубика: сирий JSON (як було) проти Catalog.
+#
+#   python bench/bench_catalog.py --n 200000
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from catalog import load_catalog  # noqa: E402
+
+
+def old_task_card(t):
+    base = [
+        f"Завдання #{t['id']} — {t['title']}",
+        t['text'],
+        f"🧵 Стібків: {t['stitches']} | Техніка: {t['tech']} | Колір: {t['color']}",
+        f"🔑 Ключове слово: {t['keyword']}"
+    ]
+    if t.get("dice_event"):
+        base.append("🎲 Подія: на цьому етапі доступний кидок кубика.")
+    return "\n".join(base)
+
+
+def bench(label, fn, n):
+    t0 = time.perf_counter()
+    fn(n)
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {n / dt:>12,.0f} ops/s")
+    return dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000)
+    ap.add_argument("--quests", default=os.path.join(ROOT, "quests_tayemnyci_150.json"))
+    args = ap.parse_args()
+
+    with open(args.quests, encoding="utf-8") as f:
+        quests = json.load(f)
+    TASKS = quests["tasks"]
+    ARTIFACTS = {a["code"]: a for a in quests["artifacts"]}
+    DICE_TABLE = quests["dice_outcomes"]
+    cat = load_catalog(args.quests)
+
+    rnd = random.Random(1)
+    progress = [rnd.randint(1, len(TASKS)) for _ in range(1024)]
+    amulet = [rnd.random() < 0.2 for _ in range(1024)]
+    values = [rnd.randint(1, 6) for _ in range(1024)]
+
+    def old_quest(n):
+        for i in range(n):
+            t = TASKS[progress[i & 1023] - 1]
+            stitches = max(100, t["stitches"] - 100) if amulet[i & 1023] else t["stitches"]
+            old_task_card({**t, "stitches": stitches})
+
+    def new_quest(n):
+        for i in range(n):
+            t = cat.task(progress[i & 1023])
+            stitches = max(100, t.stitches - 100) if amulet[i & 1023] else t.stitches
+            t.card if stitches == t.stitches else t.render(stitches)
+
+    def old_roll(n):
+        for i in range(n):
+            val = values[i & 1023]
+            next((d["effect"] for d in DICE_TABLE if d.get("value") == val), "—")
+            rnd.choice(list(ARTIFACTS.keys()))
+
+    def new_roll(n):
+        for i in range(n):
+            cat.dice_effect(values[i & 1023])
+            rnd.choice(cat.artifact_codes)
+
+    a = bench("give_quest (json dicts)", old_quest, args.n)
+    b = bench("give_quest (catalog)", new_quest, args.n)
+    print(f"  speedup x{a / b:.1f}")
+    a = bench("do_roll lookups (json)", old_roll, args.n)
+    b = bench("do_roll lookups (catalog)", new_roll, args.n)
+    print(f"  speedup x{a / b:.1f}")
+
+
+if __name__ == "__main__":
+    main()
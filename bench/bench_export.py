@@ -0,0 +1,79 @@
+# bench/bench_export.py
+# /export на 100k гравців: час, розмір файлу і пік пам'яті.
+#
+# Порівнює потокове злиття розділів SQLite (export.sqlite_rows) з "наївним"
+# варіантом — прочитати розділи цілком (dump_section) і лише потім писати, —
+# і вивантаження з JSON-сховища, де дані вже в пам'яті.
+#
+#   python bench/bench_export.py --players 100000
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from storage import SqliteStore  # noqa: E402
+from export import SECTIONS, sqlite_rows, dict_rows, player_keys, write_export  # noqa: E402
+from bench_players import synthetic_db  # noqa: E402
+
+
+def chapter_of(current: int, game: str = None):
+    return min(current, 150) // 25 + 1
+
+
+def measure(title: str, rows_factory, path: str, fmt: str, flt: dict, players: int):
+    # час і пам'ять — окремими прогонами: tracemalloc сповільнює кожну алокацію
+    t0 = time.perf_counter()
+    count = write_export(rows_factory(), path, fmt, flt, chapter_of)
+    dt = time.perf_counter() - t0
+    tracemalloc.start()
+    write_export(rows_factory(), path, fmt, flt, chapter_of)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{title:28} {fmt:4} {count:>7} рядків | {dt:6.2f}s ({players / dt / 1000:5.0f}k гравців/с) | "
+          f"{os.path.getsize(path) / 2**20:6.1f} MiB | пік пам'яті {peak / 2**20:7.1f} MiB")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=100000)
+    args = ap.parse_args()
+
+    db = synthetic_db(args.players)
+    db.setdefault("games", {})      # усі в основній грі
+    rnd = random.Random(3)
+    start = datetime(2026, 1, 1)
+    db["registrations"] = {
+        uid: {"game": "tayemnyci", "approved": True,
+              "approved_at": (start + timedelta(minutes=rnd.randint(0, 90 * 24 * 60))).isoformat(timespec="seconds")}
+        for uid in db["stats"] if rnd.random() < 0.8
+    }
+    folder = tempfile.mkdtemp(prefix="tvorcha-export-")
+    store = SqliteStore(os.path.join(folder, "game.sqlite3"))
+    store.load()
+    t0 = time.perf_counter()
+    store.import_db(db)
+    print(f"players {args.players} | SQLite заповнено за {time.perf_counter() - t0:.1f}s")
+    out = os.path.join(folder, "out")
+
+    def naive_rows():
+        # усе в пам'ять, потім запис — так виглядав би простий варіант
+        sections = {name: store.dump_section(name) for name in SECTIONS}
+        return dict_rows(sections, player_keys(sections))
+
+    for fmt in ("csv", "json"):
+        measure("sqlite, потоком", lambda: sqlite_rows(store), out, fmt, {}, args.players)
+    measure("sqlite, цілком у пам'ять", naive_rows, out, "csv", {}, args.players)
+    measure("sqlite, потоком + фільтр", lambda: sqlite_rows(store), out, "csv",
+            {"approved": True, "chapter": 3}, args.players)
+    keys = player_keys(db)
+    measure("json-сховище (dict)", lambda: dict_rows(db, keys), out, "csv", {}, args.players)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
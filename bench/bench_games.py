@@ -0,0 +1,99 @@
+# bench/bench_games.py
+# Скільки коштує кілька ігор на гарячому шляху.
+#
+# "🎯 Завдання" без реєстру (глобальний CATALOG) проти GameRegistry: гравець
+# основної гри (рядка в розділі games немає), гравець іншої гри з каталогом у
+# LRU, а також ціна промаху — компіляція каталогу, якої чекає перший апдейт
+# гравця в грі, що ще не в пам'яті.
+#
+#   python bench/bench_games.py --n 500000 --games 8 --cache 4
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from catalog import load_catalog  # noqa: E402
+from games import Game, GameRegistry  # noqa: E402
+
+QUESTS = os.path.join(ROOT, "quests_tayemnyci_150.json")
+
+
+def bench(label, fn, uids, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(uids[i % len(uids)])
+    dt = time.perf_counter() - t0
+    print(f"{label:40} {dt / n * 1e9:7.0f} нс/виклик")
+    return dt / n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500000)
+    ap.add_argument("--games", type=int, default=8)
+    ap.add_argument("--cache", type=int, default=4)
+    args = ap.parse_args()
+
+    # інші сезони — копії основного файлу під своїми іменами
+    folder = tempfile.mkdtemp(prefix="tvorcha-games-")
+    with open(QUESTS, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    games = {"main": Game("main", "Основна", QUESTS)}
+    for i in range(1, args.games):
+        path = os.path.join(folder, f"s{i}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(dict(data, game=f"Сезон {i}"), f, ensure_ascii=False)
+        games[f"s{i}"] = Game(f"s{i}", f"Сезон {i}", path)
+    reg = GameRegistry(games, "main", cache_size=args.cache)
+    catalog = reg.load_main()
+
+    uids = [str(500000000 + i) for i in range(1000)]
+    progress = {uid: {"current": 1 + i % 150} for i, uid in enumerate(uids)}
+    rows = {}       # розділ games: у гравців основної гри рядка немає
+
+    def single(uid):
+        return catalog.task(progress[uid]["current"])
+
+    def active_game(uid):
+        row = rows.get(uid)
+        return row["active"] if row is not None and row["active"] in reg.games else reg.default
+
+    def multi(uid):
+        return reg.catalog(active_game(uid)).task(progress[uid]["current"])
+
+    print(f"ігор {args.games}, LRU {args.cache}, {args.n} викликів")
+    base = bench("одна гра: CATALOG.task", single, uids, args.n)
+    main_cost = bench("реєстр, гравець основної гри", multi, uids, args.n)
+
+    asyncio.run(reg.ensure("s1"))
+    other = [str(600000000 + i) for i in range(1000)]
+    for uid in other:
+        rows[uid] = {"active": "s1", "saved": {}}
+        progress[uid] = {"current": 1}
+    other_cost = bench("реєстр, гравець іншої гри (у LRU)", multi, other, args.n)
+    print(f"надбавка: основна гра +{(main_cost - base) * 1e9:.0f} нс, інша гра +{(other_cost - base) * 1e9:.0f} нс")
+
+    # промах: перший апдейт гравця в грі, якої немає в LRU, чекає компіляцію (у потоці, loop вільний)
+    t0 = time.perf_counter()
+    load_catalog(QUESTS)
+    print(f"компіляція каталогу ({len(catalog)} завдань): {(time.perf_counter() - t0) * 1000:.1f} мс")
+
+    async def churn():
+        # гравці всіх сезонів по черзі: LRU менший за кількість ігор — частина звернень промахується
+        t0 = time.perf_counter()
+        for i in range(200):
+            await reg.ensure(f"s{1 + i % (args.games - 1)}")
+        return time.perf_counter() - t0
+
+    before = reg.loads
+    dt = asyncio.run(churn())
+    print(f"200 звернень по колу до {args.games - 1} сезонів: {reg.loads - before} компіляцій, {dt:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
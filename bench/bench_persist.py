@@ -0,0 +1,112 @@
+# bench/bench_persist.py
+# Затримка вебхука під час запису стану: старий save_db (повний json.dump з indent=2
+# прямо в обробнику) проти журналу + AsyncWriter.
+#
+#   python bench/bench_persist.py --players 3000 --updates 500
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from aiohttp import web, ClientSession
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from storage import JournalStore, AsyncWriter, empty_db  # noqa: E402
+
+
+def make_db(players: int):
+    db = empty_db()
+    for i in range(players):
+        uid = str(100000 + i)
+        db["stats"][uid] = {"name": f"P{i}", "username": None, "reports": i % 40, "stitches_total": i * 13}
+        db["progress"][uid] = {"current": 1 + i % 150, "history": []}
+        db["inventory"][uid] = {"amulet_light": 1} if i % 3 == 0 else {}
+        db["debts"][uid] = (i % 5) * 50
+        db["registrations"][uid] = {"game": "tayemnyci", "approved": True, "approved_at": "2025-11-01T10:00:00"}
+    return db
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(mode: str, players: int, updates: int, rtt: float, folder: str):
+    path = os.path.join(folder, f"{mode}.json")
+    store = JournalStore(path, compact_every=500)
+    store.db = make_db(players)
+    writer = AsyncWriter(store)
+    db = store.db
+    uids = list(db["stats"])
+
+    def old_save_db():
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(db, f, ensure_ascii=False, indent=2)
+
+    async def handle(request: web.Request):
+        data = await request.json()
+        uid = uids[data["update_id"] % len(uids)]
+        # типовий "фініш": борг, відповідь гравцю, перехід до наступного завдання
+        db["debts"][uid] = max(0, db["debts"][uid] - 50)
+        if mode == "sync":
+            old_save_db()
+        else:
+            store.mark("debts", uid)
+        await asyncio.sleep(rtt)  # m.answer → Bot API
+        db["progress"][uid]["current"] += 1
+        if mode == "sync":
+            old_save_db()
+        else:
+            store.mark("progress", uid)
+            writer.request_flush()
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/hook", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    if mode == "async":
+        writer.start()
+
+    lat = []
+    async with ClientSession() as session:
+        async def one(i):
+            t0 = time.perf_counter()
+            async with session.post(f"http://127.0.0.1:{port}/hook", json={"update_id": random.randrange(10**6) + i}) as r:
+                await r.read()
+            lat.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(updates)))
+        total = time.perf_counter() - t0
+
+    if mode == "async":
+        await writer.close()
+    await runner.cleanup()
+    print(
+        f"{mode:>5}: {updates} updates in {total:.2f}s | "
+        f"p50 {percentile(lat, 50) * 1000:.1f} ms | p99 {percentile(lat, 99) * 1000:.1f} ms | "
+        f"max {max(lat) * 1000:.1f} ms"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=3000)
+    ap.add_argument("--updates", type=int, default=500)
+    ap.add_argument("--rtt", type=float, default=0.02, help="імітація відповіді Bot API, с")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        for mode in ("sync", "async"):
+            asyncio.run(run(mode, args.players, args.updates, args.rtt, folder))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# bench/bench_players.py
+# Пам'ять на 100k гравців: вкладені dict (як у game_db.json) проти PlayerTable.
+#
+#   python bench/bench_players.py --players 100000
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from players import PlayerTable, register_artifacts  # noqa: E402
+
+ARTIFACTS = ("amulet_light", "needle_time", "bead_luck", "scissors_fate")
+
+
+def synthetic_db(players: int, seed: int = 7) -> dict:
+    rnd = random.Random(seed)
+    db = {"stats": {}, "progress": {}, "inventory": {}, "debts": {}}
+    for i in range(players):
+        uid = str(300000000 + i * 17)
+        db["stats"][uid] = {
+            "name": f"Гравчиня {i}",
+            "username": f"user_{i}" if rnd.random() < 0.7 else None,
+            "reports": rnd.randint(0, 300),
+            "stitches_total": rnd.randint(0, 250000),
+        }
+        db["progress"][uid] = {"current": rnd.randint(1, 151), "history": []}
+        inv = {}
+        for code in ARTIFACTS:
+            if rnd.random() < 0.25:
+                inv[code] = rnd.randint(1, 3)
+        db["inventory"][uid] = inv
+        db["debts"][uid] = rnd.choice((0, 0, 0, 50, 100, 150, 350))
+    return db
+
+
+def measure(build):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    dt = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size, dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=100000)
+    args = ap.parse_args()
+
+    register_artifacts(ARTIFACTS)
+    db, dict_size, dt = measure(lambda: synthetic_db(args.players))
+    print(f"dict sections : {dict_size / 2**20:8.1f} MiB  ({dict_size / args.players:6.0f} B/player, built in {dt:.2f}s)")
+
+    table, table_size, dt = measure(lambda: PlayerTable.from_db(db))
+    print(f"PlayerTable   : {table_size / 2**20:8.1f} MiB  ({table_size / args.players:6.0f} B/player, converted in {dt:.2f}s)")
+    print(f"  ratio x{dict_size / table_size:.1f}")
+
+    t0 = time.perf_counter()
+    back = table.to_db()
+    print(f"round trip    : {'lossless' if back == db else 'MISMATCH'} ({time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
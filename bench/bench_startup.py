@@ -0,0 +1,138 @@
+# bench/bench_startup.py
+# Час старту бота: від запуску процесу до першої відповіді.
+#
+# Готує БД на --players гравців, кілька разів запускає bot_main.py проти
+# заглушки Bot API (bench/loadtest.py) і для кожного запуску міряє:
+#   - http   — коли "/" вперше відповів 200 (платформа вважає сервіс живим);
+#   - ready  — коли /stats показав завантажену БД;
+#   - answer — коли гравець отримав відповідь на /start, надісланий одразу
+#              після першого 200 (апдейт чекає в черзі, поки БД вантажиться).
+# Перший запуск бачить порожній getWebhookInfo і ставить вебхук, наступні —
+# перезапуски з уже встановленим вебхуком.
+#
+#   python bench/bench_startup.py --players 20000
+#   python bench/bench_startup.py --players 20000 --env DB_BACKEND=sqlite
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+from aiohttp import web, ClientSession
+
+from loadtest import FakeBotAPI, free_port, TOKEN, ADMIN_CHAT, ROOT
+from bench_players import synthetic_db
+
+
+async def poll(url: str, proc, deadline: float, until=lambda body: True):
+    async with ClientSession() as s:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"bot exited with code {proc.returncode}")
+            try:
+                async with s.get(url) as r:
+                    if r.status == 200 and until(await r.text()):
+                        return time.perf_counter()
+            except OSError:
+                pass
+            await asyncio.sleep(0.01)
+    raise RuntimeError(f"{url}: no answer")
+
+
+async def launch(api: FakeBotAPI, env: dict, uid: int, timeout: float):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "bot_main.py")], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    t0 = time.perf_counter()
+    base = f"http://127.0.0.1:{env['PORT']}"
+    deadline = time.monotonic() + timeout
+    try:
+        t_http = await poll(base + "/", proc, deadline)
+        answered = len(api.e2e)
+        update = {"update_id": int(t0 * 1000), "message": {
+            "message_id": 1, "date": int(time.time()), "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            "chat": {"id": uid, "type": "private"},
+            "from": {"id": uid, "is_bot": False, "first_name": "Bench"}}}
+        api.expect_chat(uid, t0)
+        async with ClientSession() as s:
+            async with s.post(f"{base}/{TOKEN}", json=update) as r:
+                await r.read()
+        t_ready = await poll(base + "/stats", proc, deadline, lambda body: json.loads(body).get("ready", True))
+        while len(api.e2e) == answered and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        t_answer = t0 + api.e2e[-1] if len(api.e2e) > answered else float("nan")
+        return t_http - t0, t_ready - t0, t_answer - t0
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def run(args):
+    api = FakeBotAPI(args.api_latency / 1000)
+    api_app = web.Application()
+    api_app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(api_app, access_log=None)
+    await runner.setup()
+    api_port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", api_port).start()
+
+    folder = tempfile.mkdtemp(prefix="tvorcha-start-")
+    db_file = os.path.join(folder, "game_db.json")
+    t0 = time.perf_counter()
+    db = synthetic_db(args.players)
+    with open(db_file, "w", encoding="utf-8") as f:
+        json.dump(db, f, ensure_ascii=False)
+    print(f"players {args.players} | game_db.json {os.path.getsize(db_file) / 2**20:.1f} MiB "
+          f"(generated in {time.perf_counter() - t0:.1f}s)")
+    uid = int(next(iter(db["stats"])))
+
+    bot_port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "BOT_TOKEN": TOKEN,
+        "ADMIN_CHAT_ID": str(ADMIN_CHAT),
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{api_port}",
+        "RENDER_EXTERNAL_URL": f"http://127.0.0.1:{bot_port}",
+        "PORT": str(bot_port),
+        "DB_FILE_PATH": db_file,
+        "DB_SQLITE_PATH": os.path.join(folder, "game_db.sqlite3"),
+        "FSM_DB_PATH": os.path.join(folder, "fsm.sqlite3"),
+        "LOG_LEVEL": "WARNING",
+    })
+    for kv in args.env:
+        key, _, val = kv.partition("=")
+        env[key] = val
+
+    try:
+        if env.get("DB_BACKEND") == "sqlite":
+            # перенесення JSON -> SQLite буває один раз — не змішуємо його зі стартом
+            await launch(api, env, uid, args.timeout)
+            api.webhook["url"] = ""
+        ms = lambda v: f"{v * 1000:7.0f} ms"  # noqa: E731
+        for i in range(args.runs):
+            before = api.calls["setWebhook"]
+            http, ready, answer = await launch(api, env, uid, args.timeout)
+            kind = "set webhook" if api.calls["setWebhook"] > before else "webhook kept"
+            print(f"run {i + 1} ({kind:12}) http {ms(http)} | ready {ms(ready)} | answer {ms(answer)}")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=20000)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--api-latency", type=float, default=150, help="затримка заглушки Bot API, мс")
+    ap.add_argument("--timeout", type=float, default=120, help="с на один запуск")
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE для процесу бота")
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
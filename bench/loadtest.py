@@ -0,0 +1,331 @@
+# bench/loadtest.py
+# Навантажувальний прогін бота без Telegram.
+#
+# Піднімає локальну заглушку Bot API, запускає bot_main.py окремим процесом
+# (TELEGRAM_API_URL вказує на заглушку), шле синтетичні апдейти у вебхук із
+# заданою швидкістю і міряє:
+#   - час відповіді вебхука (ack) і повний час до першої відповіді гравцю/адміну;
+#   - пропускну здатність, обсяг записів у сховище, пам'ять процесу бота.
+#
+#   python bench/loadtest.py --players 2000 --rate 200 --duration 20
+#   python bench/loadtest.py --env DB_BACKEND=sqlite --env UPDATE_WORKERS=0
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+from collections import defaultdict, deque
+
+from aiohttp import web, ClientSession, ClientTimeout
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+TOKEN = "123456:LOADTEST"
+ADMIN_CHAT = -100200300
+ADMIN_ID = 777
+
+MIX = (
+    ("start", 5),
+    ("quest", 25),
+    ("roll", 20),
+    ("report", 25),
+    ("payment", 5),
+    ("admin", 20),
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def rss_kib(pid: int):
+    out = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS", "VmHWM")):
+                    key, val = line.split(":")
+                    out[key] = int(val.split()[0])
+    except OSError:
+        pass
+    return out
+
+
+# ================== ЗАГЛУШКА BOT API ==================
+class FakeBotAPI:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = defaultdict(int)
+        self.pending = defaultdict(deque)    # chat_id -> час відправки апдейтів, що чекають відповіді
+        self.callbacks = {}                  # callback_query_id -> час відправки
+        self.e2e = []
+        self.webhook = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        self._msg_ids = itertools.count(1)
+
+    def expect_chat(self, chat_id: int, t0: float):
+        self.pending[chat_id].append(t0)
+
+    def expect_callback(self, cq_id: str, t0: float):
+        self.callbacks[cq_id] = t0
+
+    def _message(self, chat_id):
+        return {
+            "message_id": next(self._msg_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+        }
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        form = await request.post()
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        now = time.perf_counter()
+
+        if method == "answerCallbackQuery":
+            t0 = self.callbacks.pop(form.get("callback_query_id"), None)
+            if t0 is not None:
+                self.e2e.append(now - t0)
+            return web.json_response({"ok": True, "result": True})
+
+        chat_id = int(form.get("chat_id", 0) or 0)
+        queue = self.pending.get(chat_id)
+        if queue:
+            self.e2e.append(now - queue.popleft())
+
+        if method in ("sendMessage", "sendPhoto", "sendDocument", "editMessageReplyMarkup", "editMessageText"):
+            result = self._message(chat_id)
+        elif method == "sendMediaGroup":
+            result = [self._message(chat_id) for _ in json.loads(form.get("media", "[]"))]
+        elif method == "getWebhookInfo":
+            result = self.webhook
+        elif method == "setWebhook":
+            self.webhook = dict(self.webhook, url=form.get("url", ""))
+            if form.get("allowed_updates"):
+                self.webhook["allowed_updates"] = json.loads(form["allowed_updates"])
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook = dict(self.webhook, url="")
+            self.webhook.pop("allowed_updates", None)
+            result = True
+        elif method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+# ================== СИНТЕТИЧНІ АПДЕЙТИ ==================
+class Stream:
+    def __init__(self, players: int, seed: int):
+        self.rnd = random.Random(seed)
+        self.uids = [500000000 + i for i in range(players)]
+        self.update_ids = itertools.count(1)
+        self.msg_ids = itertools.count(1)
+        self.kinds, weights = zip(*MIX)
+        self.weights = list(itertools.accumulate(weights))
+
+    def _user(self, uid):
+        return {"id": uid, "is_bot": False, "first_name": f"P{uid % 100000}", "username": f"p{uid}"}
+
+    def _message(self, uid, **extra):
+        msg = {"message_id": next(self.msg_ids), "date": int(time.time()),
+               "chat": {"id": uid, "type": "private"}, "from": self._user(uid)}
+        msg.update(extra)
+        return msg
+
+    def _command(self, uid, text):
+        return self._message(uid, text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(text)}])
+
+    def _photo(self, uid, caption=None):
+        fid = f"AgAC{self.rnd.getrandbits(64):x}"
+        sizes = [
+            {"file_id": fid + "_s", "file_unique_id": fid[-10:] + "s", "width": 90, "height": 120},
+            {"file_id": fid + "_m", "file_unique_id": fid[-10:] + "m", "width": 320, "height": 427},
+            {"file_id": fid, "file_unique_id": fid[-10:], "width": 960, "height": 1280},
+        ]
+        return self._message(uid, photo=sizes, **({"caption": caption} if caption else {}))
+
+    def next(self):
+        # -> (update, ("chat", chat_id) | ("callback", id))
+        uid = self.rnd.choice(self.uids)
+        kind = self.rnd.choices(self.kinds, cum_weights=self.weights)[0]
+        upd = {"update_id": next(self.update_ids)}
+        if kind == "start":
+            upd["message"] = self._command(uid, "/start")
+        elif kind == "quest":
+            upd["message"] = self._command(uid, "/quest")
+        elif kind == "roll":
+            upd["message"] = self._command(uid, "/roll")
+        elif kind == "report":
+            what = self.rnd.choice(("старт", "фініш"))
+            upd["message"] = self._photo(uid, f"звіт: {what} {self.rnd.randint(300, 1200)}")
+        elif kind == "payment":
+            upd["message"] = self._photo(uid)
+        else:
+            action = self.rnd.choice((f"okrep|{uid}|фініш|{self.rnd.randint(300, 1200)}", f"badrep|{uid}", f"apprpay|{uid}"))
+            cq_id = str(next(self.msg_ids))
+            upd["callback_query"] = {
+                "id": cq_id, "from": self._user(ADMIN_ID), "chat_instance": "lt", "data": action,
+                "message": {"message_id": 1, "date": int(time.time()), "chat": {"id": ADMIN_CHAT, "type": "supergroup"}},
+            }
+            return upd, ("callback", cq_id)
+        return upd, ("chat", uid)
+
+
+# ================== ПРОГІН ==================
+async def wait_ready(url: str, proc, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with ClientSession() as s:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"bot exited with code {proc.returncode}")
+            try:
+                async with s.get(url) as r:
+                    if r.status == 200:
+                        return
+            except OSError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("bot did not start")
+
+
+def db_size(folder: str) -> int:
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+
+
+async def run(args):
+    api = FakeBotAPI(args.api_latency / 1000)
+    api_app = web.Application()
+    api_app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(api_app, access_log=None)
+    await runner.setup()
+    api_port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", api_port).start()
+
+    folder = tempfile.mkdtemp(prefix="tvorcha-load-")
+    bot_port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "BOT_TOKEN": TOKEN,
+        "ADMIN_CHAT_ID": str(ADMIN_CHAT),
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{api_port}",
+        "RENDER_EXTERNAL_URL": f"http://127.0.0.1:{bot_port}",
+        "PORT": str(bot_port),
+        "DB_FILE_PATH": os.path.join(folder, "game_db.json"),
+        "DB_SQLITE_PATH": os.path.join(folder, "game_db.sqlite3"),
+        "FSM_DB_PATH": os.path.join(folder, "fsm.sqlite3"),
+        "LOG_LEVEL": "WARNING",
+        "ADMIN_CHAT_PER_MIN": "100000",   # міряємо бота, а не ліміти Telegram
+        "OUT_GLOBAL_RATE": "100000",
+    })
+    for kv in args.env:
+        key, _, val = kv.partition("=")
+        env[key] = val
+
+    if args.cluster:
+        env.update({"PROCESS_WORKERS": str(args.cluster), "DB_BACKEND": "sqlite",
+                    "CLUSTER_SOCKET_DIR": folder})
+    script = "cluster.py" if args.cluster else "bot_main.py"
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, script)], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{bot_port}"
+    try:
+        await wait_ready(base + "/", proc)
+        stream = Stream(args.players, args.seed)
+        acks, errors = [], defaultdict(int)
+        total = int(args.rate * args.duration)
+        interval = 1.0 / args.rate
+
+        async with ClientSession(timeout=ClientTimeout(total=60)) as session:
+            async def send(update, expect):
+                t0 = time.perf_counter()
+                if expect[0] == "chat":
+                    api.expect_chat(expect[1], t0)
+                else:
+                    api.expect_callback(expect[1], t0)
+                try:
+                    async with session.post(f"{base}/{TOKEN}", json=update) as r:
+                        await r.read()
+                        if r.status != 200:
+                            errors[r.status] += 1
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                acks.append(time.perf_counter() - t0)
+
+            tasks = []
+            start = time.perf_counter()
+            for i in range(total):
+                delay = start + i * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(send(*stream.next())))
+            await asyncio.gather(*tasks)
+            sent_in = time.perf_counter() - start
+
+            # чекаємо, поки бот доопрацює чергу
+            drain_deadline = time.perf_counter() + args.drain
+            while len(api.e2e) < total and time.perf_counter() < drain_deadline:
+                await asyncio.sleep(0.1)
+            elapsed = time.perf_counter() - start
+
+            async with session.get(base + "/stats") as r:
+                stats = await r.json()
+        mem = rss_kib(proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        await runner.cleanup()
+
+    ms = lambda v: f"{v * 1000:8.1f} ms"  # noqa: E731
+    print(f"players {args.players} | target {args.rate}/s for {args.duration}s | {total} updates sent in {sent_in:.1f}s")
+    print(f"answered   {len(api.e2e)}/{total} | throughput {len(api.e2e) / elapsed:.1f} updates/s")
+    print(f"ack        p50 {ms(percentile(acks, 50))} | p90 {ms(percentile(acks, 90))} | p99 {ms(percentile(acks, 99))}")
+    print(f"end-to-end p50 {ms(percentile(api.e2e, 50))} | p90 {ms(percentile(api.e2e, 90))} | "
+          f"p99 {ms(percentile(api.e2e, 99))} | max {ms(max(api.e2e) if api.e2e else float('nan'))}")
+    storage = stats.get("storage") or {}
+    print(f"storage    {storage.get('backend')} | {storage.get('bytes_written', 0) / 1024:.0f} KiB written "
+          f"in {storage.get('flushes', 0)} flushes | on disk {db_size(folder) / 1024:.0f} KiB")
+    print(f"memory     RSS {mem.get('VmRSS', 0) / 1024:.1f} MiB | peak {mem.get('VmHWM', 0) / 1024:.1f} MiB")
+    print(f"bot api    {dict(api.calls)}")
+    if errors:
+        print(f"errors     {dict(errors)}")
+    if args.json:
+        print(json.dumps({"stats": stats, "ack_p99": percentile(acks, 99), "e2e_p99": percentile(api.e2e, 99)}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=1000)
+    ap.add_argument("--rate", type=float, default=100, help="апдейтів за секунду")
+    ap.add_argument("--duration", type=float, default=10, help="секунд")
+    ap.add_argument("--api-latency", type=float, default=30, help="затримка заглушки Bot API, мс")
+    ap.add_argument("--drain", type=float, default=30, help="скільки чекати на доопрацювання черги, с")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE для процесу бота")
+    ap.add_argument("--cluster", type=int, default=0, help="N процесів через cluster.py (SQLite)")
+    ap.add_argument("--json", action="store_true", help="додатково вивести сирі /stats")
+    ap.add_argument("--verbose", action="store_true", help="показувати stderr бота")
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
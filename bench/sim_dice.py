@@ -0,0 +1,113 @@
+# bench/sim_dice.py
+# Перевірка кубика: розподіл граней з Бісером Удачі і без, наслідки кидка.
+#
+# Дві частини:
+#   - логіка зсуву: мільйони рівномірних чисел одразу через dice.thresholds
+#     (numpy.searchsorted, якщо numpy є; інакше — пачками на bisect);
+#   - сам генератор: кидки гравців через dice.draws — ті самі BLAKE2b-числа,
+#     що й у боті, тож видно, що потік рівномірний і незалежний від uid.
+# Для кожного розподілу — частоти проти dice.probabilities і хі-квадрат
+# (5 ступенів свободи: > 20.5 — відхилення з p < 0.001).
+#
+#   python bench/sim_dice.py --rolls 5000000
+#   python bench/sim_dice.py --stream 200000 --players 1000
+import os
+import sys
+import time
+import random
+import argparse
+from bisect import bisect_right
+from itertools import repeat
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dice import BEAD_BIAS, make_secret, draws, face, thresholds, probabilities  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:     # необов'язкова залежність: без неї — повільніше, але той самий результат
+    np = None
+
+DEBT = {1: 100, 2: 50}
+CHI2_P001 = 20.515      # 5 ступенів свободи
+
+
+def count_faces(rolls: int, bias: float, seed: int, batch: int = 1_000_000):
+    # -> (лічильники граней 1..6, кількість "u < 0.10" серед п'ятірок)
+    bounds = thresholds(bias)
+    counts = [0] * 6
+    lucky5 = 0
+    done = 0
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        edges = np.array(bounds)
+        while done < rolls:
+            n = min(batch, rolls - done)
+            faces = np.searchsorted(edges, rng.random(n), side="right")
+            chance = rng.random(n)
+            counts = [c + int(x) for c, x in zip(counts, np.bincount(faces, minlength=6))]
+            lucky5 += int(np.count_nonzero((faces == 4) & (chance < 0.10)))
+            done += n
+        return counts, lucky5
+    rand = random.Random(seed).random
+    while done < rolls:
+        n = min(batch, rolls - done)
+        faces = list(map(bisect_right, repeat(bounds, n), [rand() for _ in range(n)]))
+        for i in range(6):
+            counts[i] += faces.count(i)
+        lucky5 += sum(rand() < 0.10 for _ in range(faces.count(4)))
+        done += n
+    return counts, lucky5
+
+
+def chi2(counts, probs):
+    total = sum(counts)
+    return sum((c - total * p) ** 2 / (total * p) for c, p in zip(counts, probs))
+
+
+def report(title: str, counts, probs, elapsed: float):
+    total = sum(counts)
+    stat = chi2(counts, probs)
+    print(f"{title}: {total:,} кидків за {elapsed:.2f}s ({total / elapsed / 1e6:.1f} M/s)")
+    print("  грань " + " ".join(f"{i:>8}" for i in range(1, 7)))
+    print("  факт  " + " ".join(f"{c / total:8.4f}" for c in counts))
+    print("  теор  " + " ".join(f"{p:8.4f}" for p in probs))
+    verdict = "ok" if stat < CHI2_P001 else "ВІДХИЛЕННЯ"
+    print(f"  χ² = {stat:.2f} ({verdict}) | очікуваний борг за кидок {sum(DEBT.get(i + 1, 0) * c for i, c in enumerate(counts)) / total:.2f} стібків")
+    return stat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rolls", type=int, default=5_000_000, help="кидків на розподіл (логіка зсуву)")
+    ap.add_argument("--stream", type=int, default=200_000, help="кидків через dice.draws (0 — пропустити)")
+    ap.add_argument("--players", type=int, default=1000, help="гравців, між якими ділиться --stream")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    print(f"numpy: {'так' if np is not None else 'ні (пачки на bisect)'}")
+
+    failed = False
+    for title, bias in (("без бісера", 0.0), ("з Бісером Удачі", BEAD_BIAS)):
+        t0 = time.perf_counter()
+        counts, lucky5 = count_faces(args.rolls, bias, args.seed)
+        probs = probabilities(bias)
+        failed |= report(title, counts, probs, time.perf_counter() - t0) >= CHI2_P001
+        p6 = counts[5] / args.rolls
+        drop = lucky5 / args.rolls
+        print(f"  артефакт за кидок: {drop + p6:.4f} (5 і шанс 10%: {drop:.4f}, 6: {p6:.4f})")
+
+    if args.stream:
+        secret = make_secret("sim-dice")
+        per_player = max(1, args.stream // args.players)
+        counts = [0] * 6
+        t0 = time.perf_counter()
+        for p in range(args.players):
+            uid = str(500000000 + p)
+            for n in range(1, per_player + 1):
+                counts[face(draws(secret, uid, n)[0]) - 1] += 1
+        failed |= report(f"dice.draws ({args.players} гравців × {per_player})", counts, probabilities(0.0),
+                         time.perf_counter() - t0) >= CHI2_P001
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
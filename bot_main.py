@@ -2,118 +2,401 @@
 import os
 import re
 import json
-import random
+import signal
+import time
+import tempfile
+import asyncio
 import logging
+import contextvars
 from datetime import datetime
 
 from aiogram import Bot, Dispatcher, Router, F, types
 from aiogram.filters import Command
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import FSInputFile
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError
 from aiohttp import web
 
+from metrics import Registry
+from storage import JournalStore, SqliteStore, AsyncWriter, CachedSection
+from players import compact_views, register_artifacts
+from dispatch import KeyedLocks, RecentIds, WorkerPool
+from catalog import CatalogWatcher
+from games import Game, GameRegistry, load_games
+from leaderboard import Leaderboard
+from broadcast import Broadcast
+from fsm import PersistentStorage
+from cluster import serve_frames
+from webhook import ensure_webhook, ALLOWED_UPDATES
+from actions import ActionTable, token_id
+from reports import ReportRegistry, pick_size
+from scheduler import Scheduler
+from reminders import Reminders
+from dice import make_secret, draws, face, BEAD_BIAS
+from export import parse_filters, sqlite_rows, dict_rows, player_keys, write_export
+from outbound import Outbound, PRIO_PAYMENT, PRIO_ACTION, PRIO_REPORT
+
 # ================== НАЛАШТУВАННЯ ==================
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 
 BOT_TOKEN     = os.getenv("BOT_TOKEN", "").strip()
 ADMIN_CHAT_ID = int(os.getenv("ADMIN_CHAT_ID", "-1000000000000"))
 PAYMENT_CARD  = os.getenv("PAYMENT_CARD", "4441 1110 3900 4548")
 DB_FILE       = os.getenv("DB_FILE_PATH", "./game_db.json")
 QUESTS_FILE   = os.getenv("QUESTS_FILE", "./quests_tayemnyci_150.json")
+QUESTS_POLL_SEC = float(os.getenv("QUESTS_POLL_SEC", "5"))   # 0 — не стежити за файлом
+GAMES_FILE    = os.getenv("GAMES_FILE", "./games.json")        # немає файлу — одна гра з QUESTS_FILE
+GAME_CACHE_SIZE = int(os.getenv("GAME_CACHE_SIZE", "4"))       # скільки каталогів інших ігор тримати в пам'яті
+DB_BACKEND    = os.getenv("DB_BACKEND", "json").strip().lower()      # json | sqlite
+DB_SQLITE     = os.getenv("DB_SQLITE_PATH", "./game_db.sqlite3")
+DB_COMPACT_EVERY = int(os.getenv("DB_COMPACT_EVERY", "500"))
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "5000"))
+DB_COMPACT    = os.getenv("DB_COMPACT", "0") == "1"    # json: гравці в пам'яті — компактні записи
+UPDATE_WORKERS    = int(os.getenv("UPDATE_WORKERS", "8"))      # 0 — обробляти прямо у вебхуку
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+UPDATE_DEDUP_SIZE = int(os.getenv("UPDATE_DEDUP_SIZE", "10000"))
+OUT_GLOBAL_RATE    = float(os.getenv("OUT_GLOBAL_RATE", "30"))      # повідомлень/с на весь бот
+ADMIN_CHAT_PER_MIN = float(os.getenv("ADMIN_CHAT_PER_MIN", "20"))   # повідомлень/хв в одну групу
+ADMIN_BATCH_WINDOW = float(os.getenv("ADMIN_BATCH_WINDOW", "0"))    # с; >0 — звіти йдуть альбомом
+TOP_SIZE      = int(os.getenv("TOP_SIZE", "10"))
+FSM_DB_PATH   = os.getenv("FSM_DB_PATH", "./fsm.sqlite3")     # стани діалогів (FSM) — переживають перезапуск
+BROADCAST_RATE   = float(os.getenv("BROADCAST_RATE", "25"))    # повідомлень/с; запас до 30 — для відповідей гравцям
+BROADCAST_WINDOW = int(os.getenv("BROADCAST_WINDOW", "50"))     # одночасно "в польоті"
+BROADCAST_STATE  = os.getenv("BROADCAST_STATE_PATH", DB_FILE + ".broadcast")
+WORKER_SOCKET = os.getenv("WORKER_SOCKET", "").strip()     # задає cluster.py: процес-воркер без власного вебхука
+WORKER_INDEX  = int(os.getenv("WORKER_INDEX", "0"))
+WORKER_COUNT  = int(os.getenv("WORKER_COUNT", "1"))
+ACTION_TTL_DAYS  = float(os.getenv("ACTION_TTL_DAYS", "7"))    # кнопки старших карток уже не діють
+ACTION_LIMIT     = int(os.getenv("ACTION_LIMIT", "10000"))     # не більше стількох відкритих карток
+REPORTS_PER_PLAYER = int(os.getenv("REPORTS_PER_PLAYER", "100"))   # скільки звітів гравця зберігати
+REPORTS_PAGE     = int(os.getenv("REPORTS_PAGE", "5"))            # фото на сторінці /reports (2–10)
+ADMIN_PHOTO_MAX_SIDE = int(os.getenv("ADMIN_PHOTO_MAX_SIDE", "0"))  # >0 — в адмін-групу менший розмір фото, px
+RANKS_REFRESH_SEC = float(os.getenv("RANKS_REFRESH_SEC", "30"))   # у кластері: як часто бачити чужих гравців у рейтингу
+REMIND_DEBT_DAYS = float(os.getenv("REMIND_DEBT_DAYS", "3"))     # як часто нагадувати про борг; 0 — ні
+REMIND_IDLE_DAYS = float(os.getenv("REMIND_IDLE_DAYS", "5"))     # пауза без звітів, після якої нагадуємо; 0 — ні
+REMIND_CHECK_MIN = float(os.getenv("REMIND_CHECK_MIN", "60"))    # як часто шукати таких гравців
+REMIND_RATE      = float(os.getenv("REMIND_RATE", "10"))         # нагадувань/с — лишаємо місце відповідям
+SCHEDULE_STATE   = os.getenv("SCHEDULE_STATE_PATH", DB_FILE + ".schedule")
+DICE_SECRET   = os.getenv("DICE_SECRET", "").strip()   # ключ кубика; без нього — похідний від BOT_TOKEN
+ROLL_LOG_SIZE = int(os.getenv("ROLL_LOG_SIZE", "50"))  # скільки останніх кидків гравця пам'ятати
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").strip()   # напр. локальний Bot API або заглушка для навантажувальних тестів
 PRICE         = 100
 
 if not BOT_TOKEN:
     raise RuntimeError("Environment BOT_TOKEN is missing")
 
-bot = Bot(BOT_TOKEN)
-dp  = Dispatcher(storage=MemoryStorage())
+if TELEGRAM_API_URL:
+    bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)))
+else:
+    bot = Bot(BOT_TOKEN)
+outbox = Outbound(bot, global_rate=OUT_GLOBAL_RATE, group_per_minute=ADMIN_CHAT_PER_MIN)
+fsm_storage = PersistentStorage(FSM_DB_PATH, cache_size=DB_CACHE_SIZE)
+dp  = Dispatcher(storage=fsm_storage)
 rt  = Router()
 dp.include_router(rt)
 
-random.seed(42)
+DICE_KEY = make_secret(DICE_SECRET or BOT_TOKEN)
+
+# ================== МЕТРИКИ ==================
+METRICS = Registry()
+M_HANDLER   = METRICS.histogram("bot_handler_seconds", "Час роботи обробника", ("handler",))
+M_HANDLER_E = METRICS.counter("bot_handler_errors_total", "Винятки в обробниках", ("handler",))
+M_LOCK_WAIT = METRICS.histogram("bot_player_lock_wait_seconds", "Очікування черги гравця")
+M_FLUSH     = METRICS.histogram("bot_db_flush_seconds", "Запис змін у сховище (save_db)")
+M_FLUSH_B   = METRICS.counter("bot_db_written_bytes_total", "Байтів записано у сховище")
+M_API       = METRICS.histogram("bot_api_request_seconds", "Запити до Bot API", ("method",))
+M_API_R     = METRICS.counter("bot_api_requests_total", "Відповіді Bot API за кодом", ("method", "code"))
+
+async def handler_timing(handler, event, data):
+    obj = data.get("handler")
+    name = obj.callback.__name__ if obj is not None else "?"
+    t0 = time.perf_counter()
+    try:
+        return await handler(event, data)
+    except Exception:
+        M_HANDLER_E.inc(name)
+        raise
+    finally:
+        M_HANDLER.observe(time.perf_counter() - t0, name)
+
+rt.message.middleware(handler_timing)
+rt.callback_query.middleware(handler_timing)
+
+def _api_code(e: Exception) -> str:
+    if isinstance(e, TelegramNetworkError):
+        return "network"
+    # у aiogram класи помилок відповідають HTTP-кодам Bot API
+    codes = {"TelegramRetryAfter": "429", "TelegramForbiddenError": "403", "TelegramBadRequest": "400",
+             "TelegramNotFound": "404", "TelegramUnauthorizedError": "401", "TelegramConflictError": "409",
+             "TelegramEntityTooLarge": "413", "TelegramServerError": "5xx"}
+    return codes.get(type(e).__name__, "error")
+
+@bot.session.middleware()
+async def api_timing(make_request, bot_, method):
+    name = type(method).__name__
+    t0 = time.perf_counter()
+    try:
+        result = await make_request(bot_, method)
+    except (TelegramAPIError, TelegramNetworkError) as e:
+        M_API_R.inc(name, _api_code(e))
+        raise
+    finally:
+        M_API.observe(time.perf_counter() - t0, name)
+    M_API_R.inc(name, "200")
+    return result
 
 # ================== ДАНІ ГРИ ==================
-def _empty_db():
-    return {
-        "pending": {},
-        "registrations": {},
-        "stats": {},
-        "progress": {},
-        "inventory": {},
-        "debts": {}
-    }
+if DB_BACKEND == "sqlite":
+    # при першому запуску дані з DB_FILE_PATH переносяться автоматично
+    store = SqliteStore(DB_SQLITE, cache_size=DB_CACHE_SIZE, import_from=DB_FILE)
+else:
+    store = JournalStore(DB_FILE, compact_every=DB_COMPACT_EVERY,
+                         views=compact_views if DB_COMPACT else None, cache_size=DB_CACHE_SIZE)
+writer = AsyncWriter(store)
+writer.observe = lambda seconds, nbytes: (M_FLUSH.observe(seconds), M_FLUSH_B.inc(amount=nbytes))
+
+# усередині апдейта save_db() лише відкладає запис — middleware скидає все одним разом
+_in_update = contextvars.ContextVar("_in_update", default=False)
 
 def load_db():
     try:
-        if not os.path.exists(DB_FILE):
-            return _empty_db()
-        with open(DB_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return store.load()
     except Exception:
-        return _empty_db()
-
-def save_db(db):
-    os.makedirs(os.path.dirname(DB_FILE) or ".", exist_ok=True)
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
-
-def load_quests():
-    # очікуємо структуру:
-    # { "tasks":[{id,title,text,stitches,tech,color,keyword,dice_event?}], "artifacts":[{code,name,effect}], "dice_outcomes":[{value,effect}] }
-    if os.path.exists(QUESTS_FILE):
-        with open(QUESTS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    # fallback мінімальний набір, щоб не впасти
-    return {
-        "tasks": [
-            {
-                "id": 1,
-                "title": "Перший стібок",
-                "text": "Зроби 400 стібків у будь-якому процесі.",
-                "stitches": 400,
-                "tech": "хрестик",
-                "color": "вільно",
-                "keyword": "#СТАРТ_1",
-                "dice_event": True
-            }
-        ],
-        "artifacts": [
-            {"code": "amulet_light",  "name": "Амулет Світла",  "effect": "-100 стібків у наступному завданні"},
-            {"code": "bead_luck",     "name": "Бісер Удачі",   "effect": "Кращий шанс на 5–6 під час кидка"},
-            {"code": "scissors_fate", "name": "Ножиці Долі",   "effect": "Разове зняття кари/штрафу"}
-        ],
-        "dice_outcomes": [
-            {"value": 1, "effect": "+100 борг стібків"},
-            {"value": 2, "effect": "+50 борг стібків"},
-            {"value": 3, "effect": "нічого не відбулося"},
-            {"value": 4, "effect": "нічого не відбулося"},
-            {"value": 5, "effect": "шанс на артефакт або -100 стібків у наступному"},
-            {"value": 6, "effect": "гарантований артефакт"}
-        ]
-    }
+        if DB_BACKEND == "sqlite":
+            raise
+        logging.exception("DB load failed, starting empty")
+        return store.db
 
-db = load_db()
-quests = load_quests()
+def touch(section: str, uid: str):
+    # позначає зміну; у журнал потрапить при наступному save_db()
+    store.mark(section, uid)
 
-TASKS      = quests.get("tasks", [])
-ARTIFACTS  = {a["code"]: a for a in quests.get("artifacts", [])}
-DICE_TABLE = quests.get("dice_outcomes", [])
+def save_db():
+    if _in_update.get():
+        return
+    writer.request_flush()
+
+def update_player(update: types.Update):
+    # гравець, якого стосується апдейт (для адмін-кнопок — той, чий звіт/оплата)
+    if update.callback_query:
+        parts = (update.callback_query.data or "").split("|")
+        if len(parts) > 1 and parts[1].isdigit():
+            return parts[1]
+        return str(update.callback_query.from_user.id)
+    if update.message and update.message.from_user:
+        return str(update.message.from_user.id)
+    return None
+
+@dp.update.outer_middleware()
+async def persist_middleware(handler, event, data):
+    uid = update_player(event)
+    if uid:
+        await writer.prefetch(uid)
+        # каталог неосновної гри — в пам'ять до обробника (зазвичай він уже в LRU)
+        code = active_game(uid)
+        if code != GAMES.default:
+            await GAMES.ensure(code)
+    token = _in_update.set(True)
+    try:
+        return await handler(event, data)
+    finally:
+        _in_update.reset(token)
+        writer.request_flush()
+
+# очікуємо структуру:
+# { "tasks":[{id,title,text,stitches,tech,color,keyword,dice_event?}], "artifacts":[{code,name,effect}], "dice_outcomes":[{value,effect}] }
+# fallback мінімальний набір, щоб не впасти
+QUESTS_FALLBACK = {
+    "tasks": [
+        {
+            "id": 1,
+            "title": "Перший стібок",
+            "text": "Зроби 400 стібків у будь-якому процесі.",
+            "stitches": 400,
+            "tech": "хрестик",
+            "color": "вільно",
+            "keyword": "#СТАРТ_1",
+            "dice_event": True
+        }
+    ],
+    "artifacts": [
+        {"code": "amulet_light",  "name": "Амулет Світла",  "effect": "-100 стібків у наступному завданні"},
+        {"code": "bead_luck",     "name": "Бісер Удачі",   "effect": "Кращий шанс на 5–6 під час кидка"},
+        {"code": "scissors_fate", "name": "Ножиці Долі",   "effect": "Разове зняття кари/штрафу"}
+    ],
+    "dice_outcomes": [
+        {"value": 1, "effect": "+100 борг стібків"},
+        {"value": 2, "effect": "+50 борг стібків"},
+        {"value": 3, "effect": "нічого не відбулося"},
+        {"value": 4, "effect": "нічого не відбулося"},
+        {"value": 5, "effect": "шанс на артефакт або -100 стібків у наступному"},
+        {"value": 6, "effect": "гарантований артефакт"}
+    ]
+}
+
+# каталог, БД та індекси над нею завантажує load_state() у потоці запису вже після
+# старту HTTP-сервера: вебхук відповідає одразу, а ранні апдейти чекають у черзі
+CATALOG = None
+db = None
+actions = None
+registry = None
+quests_watcher = None
+state_ready = asyncio.Event()
+
+# ігри: CATALOG — каталог основної гри, решта вантажаться, коли в них хтось грає
+GAMES = GameRegistry(*load_games(GAMES_FILE, Game("tayemnyci", "Таємниці Ниток", QUESTS_FILE)),
+                     cache_size=GAME_CACHE_SIZE, fallback=QUESTS_FALLBACK)
+
+def chapter_of(current: int, cat=None):
+    # хто пройшов усе — лишається в останній главі
+    cat = cat or CATALOG
+    t = cat.task(min(current, len(cat)))
+    return t.chapter if t is not None else None
+
+def game_chapter(current: int, game: str):
+    # для /export (з потоку): глава в каталозі гри гравця
+    return chapter_of(current, GAMES.catalog(game) if game in GAMES else None)
+
+# рейтинги будуються один раз у load_state(); далі їх підправляють обробники, що змінюють стібки/прогрес
+ranks = Leaderboard(chapter_of, top_n=TOP_SIZE)
+
+# індекси для нагадувань; у кластері кожен процес нагадує лише своїм гравцям (та сама остача, що й у cluster.py)
+reminders = Reminders(outbox, REMIND_IDLE_DAYS, rate=min(REMIND_RATE, OUT_GLOBAL_RATE),
+                      owns=lambda uid: int(uid) % WORKER_COUNT == WORKER_INDEX)
+
+def _swap_catalog(fresh):
+    # одне присвоєння: обробник, що вже взяв завдання, дограє зі старою версією
+    global CATALOG
+    CATALOG = GAMES.main = fresh
+    ranks.set_chapters(chapter_of)
+
+def load_state():
+    global CATALOG, db, actions, registry, quests_watcher
+    t0 = time.perf_counter()
+    CATALOG = GAMES.load_main()
+    register_artifacts(CATALOG.artifact_codes)
+    db = load_db()
+
+    # відкриті картки адмін-групи: кожна дія застосовується рівно один раз
+    actions = ActionTable(db["actions"], lambda key: touch("actions", key), worker=WORKER_INDEX,
+                          ttl=ACTION_TTL_DAYS * 86400, limit=ACTION_LIMIT)
+    actions.load()
+
+    # історія фото-звітів і індекс повторів за file_unique_id
+    registry = ReportRegistry(db["reports"], lambda uid: touch("reports", uid), per_player=REPORTS_PER_PLAYER,
+                              read=(lambda uid: json.loads(store.read_row("reports", uid) or "[]")) if WORKER_SOCKET else None)
+    last_reports = registry.build()
+
+    ranks.build(db["stats"], db["progress"])
+    off_board(ranks, db["games"])
+    reminders.load(last_reports, db["registrations"], db["debts"])
+
+    # правки у файлі квестів підхоплюються без перезапуску і повторного set_webhook
+    quests_watcher = CatalogWatcher(GAMES.games[GAMES.default].quests, CATALOG, _swap_catalog, interval=QUESTS_POLL_SEC)
+    logging.info(f"📦 state loaded in {time.perf_counter() - t0:.2f}s: {len(ranks)} players, {len(CATALOG)} tasks, "
+                 f"{len(GAMES.games)} games")
 
 # ================== КОРИСНІ ФУНКЦІЇ ==================
 def ensure_user(uid: int, user: types.User):
     suid = str(uid)
-    db["stats"].setdefault(suid, {
-        "name": user.first_name,
-        "username": user.username,
-        "reports": 0,
-        "stitches_total": 0
-    })
-    db["progress"].setdefault(suid, {"current": 1, "history": []})
-    db["inventory"].setdefault(suid, {})
-    db["debts"].setdefault(suid, 0)
-
-def game_name(_: str) -> str:
-    return "Таємниці Ниток"
+    defaults = (
+        ("stats", lambda: {
+            "name": user.first_name,
+            "username": user.username,
+            "reports": 0,
+            "stitches_total": 0
+        }),
+        ("progress", lambda: {"current": 1, "history": []}),
+        ("inventory", dict),
+        ("debts", int),
+    )
+    created = False
+    for section, make in defaults:
+        if suid not in db[section]:
+            db[section][suid] = make()
+            touch(section, suid)
+            created = True
+    if created:
+        ranks.update(suid, db["stats"][suid], board_progress(suid))
+
+# ================== ІГРИ ==================
+# Розділи registrations/progress/inventory/debts — завжди активна гра гравця;
+# стан інших ігор: db["games"][uid] = {"active": код, "saved": {код: {розділ: значення}}}.
+# Рядка немає — гравець в основній грі, тож для неї все як до появи ігор.
+GAME_SECTIONS = {
+    "pending": None,            # скрин оплати чекає на адміна — у кожній грі свій
+    "registrations": None,      # не реєструвалася — запису немає
+    "progress": lambda: {"current": 1, "history": []},
+    "inventory": dict,
+    "debts": int,
+}
+_OFF_BOARD = {"current": 0}
+
+def active_game(suid: str) -> str:
+    row = db["games"].get(suid)
+    return row["active"] if row is not None and row["active"] in GAMES.games else GAMES.default
+
+def catalog_for(suid: str):
+    return GAMES.catalog(active_game(suid))
+
+def game_name(suid: str) -> str:
+    return GAMES.name(active_game(suid))
+
+def board_progress(suid: str):
+    # глави рейтингу — основної гри; гравці інших ігор у них не потрапляють
+    return db["progress"].get(suid) if active_game(suid) == GAMES.default else _OFF_BOARD
+
+def off_board(board, games):
+    games = games.export() if isinstance(games, CachedSection) else games
+    for uid, row in games.items():
+        if row["active"] in GAMES.games and row["active"] != GAMES.default:
+            board.update(uid, progress=_OFF_BOARD)
+
+def game_get(suid: str, code: str, section: str):
+    # значення розділу гри code: активної — звичайний розділ, іншої — її збережений стан
+    if code == active_game(suid):
+        return db[section].get(suid)
+    return (((db["games"].get(suid) or {}).get("saved") or {}).get(code) or {}).get(section)
+
+def game_put(suid: str, code: str, section: str, value):
+    # запис у розділ гри code: активної — звичайний розділ, іншої — її збережений стан; None — видалити
+    if code == active_game(suid):
+        if value is None:
+            db[section].pop(suid, None)
+        else:
+            db[section][suid] = value
+        touch(section, suid)
+        return
+    row = db["games"].get(suid) or {"active": GAMES.default, "saved": {}}
+    row["saved"].setdefault(code, {})[section] = value
+    db["games"][suid] = row
+    touch("games", suid)
+
+def switch_game(suid: str, code: str) -> bool:
+    row = db["games"].get(suid) or {"active": GAMES.default, "saved": {}}
+    old = active_game(suid)
+    if old == code:
+        return False
+    row["saved"][old] = {name: db[name].get(suid) for name in GAME_SECTIONS}
+    saved = row["saved"].pop(code, None) or {}
+    for name, make in GAME_SECTIONS.items():
+        value = saved.get(name)
+        if value is None and make is not None:
+            value = make()
+        if value is None:
+            db[name].pop(suid, None)
+        else:
+            db[name][suid] = value
+        touch(name, suid)
+    row["active"] = code
+    db["games"][suid] = row
+    touch("games", suid)
+    reminders.debt_changed(suid, db["debts"][suid])
+    ranks.update(suid, progress=board_progress(suid))
+    save_db()
+    return True
 
 def main_menu():
     kb = ReplyKeyboardBuilder()
@@ -125,27 +408,30 @@ def main_menu():
     kb.button(text="🎲 Кинути кубик")
     kb.button(text="🎒 Інвентар")
     kb.button(text="📊 Моя статистика")
-    kb.adjust(2, 2, 2, 2)
+    kb.button(text="🏆 Рейтинг")
+    kb.adjust(2, 2, 2, 2, 1)
     return kb.as_markup(resize_keyboard=True)
 
-def task_card(t):
-    base = [
-        f"Завдання #{t['id']} — {t['title']}",
-        t['text'],
-        f"🧵 Стібків: {t['stitches']} | Техніка: {t['tech']} | Колір: {t['color']}",
-        f"🔑 Ключове слово: {t['keyword']}"
-    ]
-    if t.get("dice_event"):
-        base.append("🎲 Подія: на цьому етапі доступний кидок кубика.")
-    return "\n".join(base)
-
 def grant_artifact(suid: str, code: str) -> str:
-    if code not in ARTIFACTS:
+    cat = catalog_for(suid)
+    if code not in cat.artifacts:
         return "Невідомий артефакт"
     inv = db["inventory"].setdefault(suid, {})
     inv[code] = inv.get(code, 0) + 1
-    save_db(db)
-    return ARTIFACTS[code]["name"]
+    touch("inventory", suid)
+    save_db()
+    return cat.artifacts[code]["name"]
+
+def add_debt(suid: str, amount: int, game: str = None):
+    # усі зміни боргу — тут, щоб індекс боржників не розходився з БД;
+    # game — гра картки: якщо гравець відтоді перемкнувся, борг іде в її збережений стан
+    if game is not None and game != active_game(suid):
+        game_put(suid, game, "debts", max(0, (game_get(suid, game, "debts") or 0) + amount))
+        return
+    debt = max(0, db["debts"].get(suid, 0) + amount)
+    db["debts"][suid] = debt
+    touch("debts", suid)
+    reminders.debt_changed(suid, debt)
 
 def apply_artifact_effects_on_next(suid: str, base_stitches: int) -> int:
     # Амулет Світла: -100 стібків у наступному завданні, потім згорає
@@ -154,23 +440,24 @@ def apply_artifact_effects_on_next(suid: str, base_stitches: int) -> int:
         inv["amulet_light"] -= 1
         if inv["amulet_light"] <= 0:
             inv.pop("amulet_light", None)
-        save_db(db)
+        touch("inventory", suid)
+        save_db()
         return max(100, base_stitches - 100)
     return base_stitches
 
-def roll_dice(suid: str) -> int:
-    # Бісер Удачі злегка зсуває шанс у бік 5–6
-    inv = db["inventory"].setdefault(suid, {})
-    bias = 0.0
-    if inv.get("bead_luck", 0) > 0:
-        bias = 0.10
-    r = random.random()
-    if r < (1/6 - bias/2): return 1
-    if r < (2/6 - bias/2): return 2
-    if r < (3/6):          return 3
-    if r < (4/6):          return 4
-    if r < (5/6 + bias/2): return 5
-    return 6
+def roll_dice(suid: str):
+    # n-й кидок гравця завжди дає ті самі числа (dice.py); журнал: [n, час, грань, бісер, артефакт?]
+    rec = db["rolls"].setdefault(suid, {"n": 0, "log": []})
+    rec["n"] += 1
+    bead = db["inventory"].get(suid, {}).get("bead_luck", 0) > 0
+    u = draws(DICE_KEY, suid, rec["n"])
+    # Бісер Удачі зсуває шанс з 1–2 на 5–6
+    val = face(u[0], BEAD_BIAS if bead else 0.0)
+    entry = [rec["n"], int(time.time()), val, int(bead)]
+    rec["log"].append(entry)
+    del rec["log"][:-ROLL_LOG_SIZE]
+    touch("rolls", suid)
+    return val, u, entry
 
 # ================== ХЕНДЛЕРИ МЕНЮ ==================
 @rt.message(Command("start"))
@@ -179,8 +466,35 @@ async def start_cmd(m: types.Message):
     await m.answer("Привіт! 🧶 Я бот творчої бджілки. Обери дію нижче 👇", reply_markup=main_menu())
 
 @rt.message(F.text == "🎮 Ігри")
+@rt.message(Command("games"))
 async def show_games(m: types.Message):
-    await m.answer("Активна гра: Таємниці Ниток.\nОплати участь та надсилай звіти.", parse_mode="Markdown")
+    uid = str(m.from_user.id)
+    code = active_game(uid)
+    if len(GAMES.games) == 1:
+        await m.answer(f"Активна гра: {GAMES.name(code)}.\nОплати участь та надсилай звіти.")
+        return
+    kb = InlineKeyboardBuilder()
+    for g in GAMES.games.values():
+        kb.button(text=f"✅ {g.name}" if g.code == code else g.name, callback_data=f"game|{g.code}")
+    kb.adjust(1)
+    await m.answer(f"Активна гра: {GAMES.name(code)}.\n"
+                   "Обери гру — у кожної своя оплата, завдання, інвентар і борг.", reply_markup=kb.as_markup())
+
+@rt.callback_query(F.data.startswith("game|"))
+async def pick_game(call: types.CallbackQuery):
+    code = call.data.split("|", 1)[1]
+    if code not in GAMES:
+        await call.answer("Цієї гри вже немає", show_alert=True)
+        return
+    uid = str(call.from_user.id)
+    ensure_user(call.from_user.id, call.from_user)
+    if not switch_game(uid, code):
+        await call.answer("Ця гра вже активна")
+        return
+    await call.answer(f"Активна гра: {GAMES.name(code)}")
+    reg = db["registrations"].get(uid)
+    hint = "Продовжуй у «🎯 Завдання»." if reg and reg.get("approved") else "Для участі — «💳 Оплата»."
+    await call.message.answer(f"🎮 Тепер ти у грі {GAMES.name(code)}.\n{hint}")
 
 @rt.message(F.text == "💳 Оплата")
 @rt.message(Command("pay", "оплата"))
@@ -200,7 +514,7 @@ async def my_status(m: types.Message):
     reg = db["registrations"].get(uid)
     if reg and reg.get("approved"):
         t_index = db["progress"][uid]["current"]
-        await m.answer(f"✅ Ти у грі {game_name('x')}. Поточне завдання: #{t_index}", parse_mode="Markdown")
+        await m.answer(f"✅ Ти у грі {game_name(uid)}. Поточне завдання: #{t_index}", parse_mode="Markdown")
     elif uid in db["pending"]:
         await m.answer("⏳ Заявка очікує підтвердження адміністратором.")
     else:
@@ -217,54 +531,59 @@ async def report_help(m: types.Message):
     )
 
 @rt.message(Command("quest"))
-@rt.message(F.text.contains("Завдання"))
+# команди адміна (/broadcast … Завдання …) сюди не потрапляють
+@rt.message(F.text.contains("Завдання") & ~F.text.startswith("/"))
 async def give_quest(m: types.Message):
     uid = str(m.from_user.id)
     ensure_user(m.from_user.id, m.from_user)
-    cur = db["progress"][uid]["current"]
-    if cur > len(TASKS):
+    t = catalog_for(uid).task(db["progress"][uid]["current"])
+    if t is None:
         await m.answer("🏁 Фінал! Усі завдання виконано. Ти — Майстриня Осердя ✨")
         return
-    t = TASKS[cur - 1]
-    stitches = apply_artifact_effects_on_next(uid, t["stitches"])
-    card = {**t, "stitches": stitches}
-    await m.answer(task_card(card), parse_mode="Markdown")
+    stitches = apply_artifact_effects_on_next(uid, t.stitches)
+    await m.answer(t.card if stitches == t.stitches else t.render(stitches), parse_mode="Markdown")
 
 @rt.message(F.text == "🎲 Кинути кубик")
 @rt.message(Command("roll"))
 async def do_roll(m: types.Message):
     uid = str(m.from_user.id)
     ensure_user(m.from_user.id, m.from_user)
-    cur = db["progress"][uid]["current"]
-    if cur > len(TASKS):
+    cat = catalog_for(uid)
+    t = cat.task(db["progress"][uid]["current"])
+    if t is None:
         await m.answer("Гра завершена. Кубик більше не впливає ✨")
         return
-    t = TASKS[cur - 1]
-    if not t.get("dice_event"):
+    if not t.dice_event:
         await m.answer("На цьому етапі доля спить. Кубик не потрібен 🙂")
         return
 
-    val = roll_dice(uid)
-    note = next((d["effect"] for d in DICE_TABLE if d.get("value") == val), "—")
+    val, u, entry = roll_dice(uid)
+    note = cat.dice_effect(val)
     text = f"🎲 Кубик: {val} → {note}"
 
     if val in (1, 2):
         add = 100 if val == 1 else 50
-        db["debts"][uid] = db["debts"].get(uid, 0) + add
+        add_debt(uid, add)
         text += f"\n📌 Додано борг: +{add} стібків (погашення з наступних завдань)."
     elif val == 5:
         # 10% артефакт, інакше тимчасовий -100
-        if random.random() < 0.10 and ARTIFACTS:
-            name = grant_artifact(uid, random.choice(list(ARTIFACTS.keys())))
+        codes = cat.artifact_codes
+        if u[1] < 0.10 and codes:
+            code = codes[int(u[2] * len(codes))]
+            name = grant_artifact(uid, code)
             text += f"\n🎁 Випав артефакт: {name}"
         else:
-            grant_artifact(uid, "amulet_light")
+            code = "amulet_light"
+            grant_artifact(uid, code)
             text += "\n🎁 Бонус: -100 стібків до наступного завдання."
-    elif val == 6 and ARTIFACTS:
-        name = grant_artifact(uid, random.choice(list(ARTIFACTS.keys())))
+        entry.append(code)
+    elif val == 6 and cat.artifact_codes:
+        code = cat.artifact_codes[int(u[2] * len(cat.artifact_codes))]
+        name = grant_artifact(uid, code)
+        entry.append(code)
         text += f"\n🎁 Випав артефакт: {name}"
 
-    save_db(db)
+    save_db()
     await m.answer(text, parse_mode="Markdown")
 
 @rt.message(F.text == "🎒 Інвентар")
@@ -276,8 +595,9 @@ async def show_bag(m: types.Message):
         await m.answer("🎒 Порожньо. Артефакти ще не знайдені.")
         return
     lines = ["🎒 Твої артефакти:"]
+    cat = catalog_for(uid)
     for code, count in inv.items():
-        meta = ARTIFACTS.get(code, {"name": code, "effect": ""})
+        meta = cat.artifacts.get(code, {"name": code, "effect": ""})
         lines.append(f"• {meta['name']} ×{count} — {meta.get('effect','')}")
     await m.answer("\n".join(lines), parse_mode="Markdown")
 
@@ -295,10 +615,199 @@ async def mystats(m: types.Message):
         "📊 Твоя статистика\n"
         f"Звіти: {s.get('reports', 0)}\n"
         f"Сумарно стібків: {s.get('stitches_total', 0)}\n"
-        f"Поточне завдання: #{cur if cur <= len(TASKS) else 'фінал'}\n"
+        f"Поточне завдання: #{cur if cur <= len(catalog_for(uid)) else 'фінал'}\n"
         f"Борг стібків: {debt}"
     )
 
+# ================== РЕЙТИНГ ==================
+def _render_top(chapter):
+    def render(rows):
+        if chapter is None:
+            lines = [f"🏆 Топ-{TOP_SIZE} за стібками"]
+            lines += [f"{place}. {name} — {stitches} 🧵" for place, _, name, stitches, _ in rows]
+        else:
+            c = CATALOG.chapter(chapter)
+            lines = [f"🏆 Глава {chapter}: {c.name if c else ''} — топ-{TOP_SIZE}"]
+            lines += [f"{place}. {name} — {f'завдання #{cur}' if cur <= len(CATALOG) else 'фінал'}, {stitches} 🧵"
+                      for place, _, name, stitches, cur in rows]
+        if not rows:
+            lines.append("Поки що порожньо.")
+        return "\n".join(lines)
+    return render
+
+@rt.message(F.text == "🏆 Рейтинг")
+@rt.message(Command("top"))
+async def show_top(m: types.Message):
+    uid = str(m.from_user.id)
+    arg = (m.text or "").split()[1:2]
+    chapter = None
+    if arg:
+        if not arg[0].isdigit() or CATALOG.chapter(int(arg[0])) is None:
+            await m.answer(f"Глави: 1–{len(CATALOG.chapters)}. Напр.: /top 2")
+            return
+        chapter = int(arg[0])
+    text = ranks.text(chapter, _render_top(chapter))
+    place = ranks.rank(uid, chapter)
+    if place is not None:
+        total = len(ranks.overall) if chapter is None else len(ranks.chapters[chapter])
+        text += f"\n\nТвоє місце: {place} з {total}"
+    await m.answer(text)
+
+@rt.message(Command("chapters"))
+async def chapter_stats(m: types.Message):
+    counts = ranks.chapter_counts()
+    lines = ["📖 Де зараз гравчині:"]
+    for c in CATALOG.chapters:
+        lines.append(f"{c.index}. {c.name or '—'} (#{c.first}–{c.last}): {counts.get(c.index, 0)}")
+    lines.append(f"Усього: {len(ranks)}")
+    await m.answer("\n".join(lines))
+
+# ================== РОЗСИЛКА ==================
+def approved_players(after: int):
+    # uid за зростанням, починаючи після курсора; читаємо сховище потоком
+    if DB_BACKEND == "sqlite":
+        # повз кеш: у кластері чужі гравці в кеші цього процесу були б застарілими
+        for uid, raw in store.iter_rows("registrations", after=after):
+            if json.loads(raw).get("approved"):
+                yield uid
+        return
+    regs = db["registrations"]
+    for uid in sorted(uid for uid in map(int, regs) if uid > after):
+        reg = regs.get(str(uid))
+        if reg and reg.get("approved"):
+            yield uid
+
+broadcaster = Broadcast(outbox, approved_players, BROADCAST_STATE, ADMIN_CHAT_ID,
+                        rate=min(BROADCAST_RATE, OUT_GLOBAL_RATE), window=BROADCAST_WINDOW)
+
+@rt.message(Command("broadcast"))
+async def broadcast_cmd(m: types.Message):
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    text = (m.text or "").partition(" ")[2].strip()
+    if not text:
+        await m.answer(broadcaster.progress_text() + "\n\n/broadcast <текст> — нова розсилка")
+        return
+    if broadcaster.running:
+        await m.answer("⏳ Розсилка вже йде. Зупинити: /broadcast_stop")
+        return
+    await broadcaster.start(text)
+
+@rt.message(Command("broadcast_stop"))
+async def broadcast_stop(m: types.Message):
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    if not broadcaster.running:
+        await m.answer("Розсилка зараз не йде.")
+        return
+    await broadcaster.stop()
+
+@rt.message(Command("broadcast_resume"))
+async def broadcast_resume(m: types.Message):
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    if not await broadcaster.resume():
+        await m.answer("Немає призупиненої розсилки.")
+
+# ================== НАГАДУВАННЯ ==================
+# Кандидати беруться з індексів (reminders.py); тут — лише перевірка гравця
+# перед відправкою: його рядки підтягуються так само, як для апдейта.
+async def _debt_text(uid: str):
+    await writer.prefetch(uid)
+    debt = db["debts"].get(uid, 0)
+    reg = db["registrations"].get(uid)
+    if debt <= 0 or not (reg and reg.get("approved")):
+        return None
+    return (f"🧵 Нагадування: борг стібків — {debt}.\n"
+            "Він гаситься із завдань після фінішу (не більше половини завдання за раз).")
+
+async def _idle_text(uid: str):
+    await writer.prefetch(uid)
+    reg = db["registrations"].get(uid)
+    cat = await GAMES.ensure(active_game(uid))
+    t = cat.task(db["progress"].get(uid, {}).get("current", 1))
+    if not (reg and reg.get("approved")) or t is None:
+        return None
+    return (f"🕯 Нитки сумують без тебе… Завдання #{t.id} «{t.title}» чекає.\n"
+            "Надішли звіт, коли будеш готова — «🎯 Завдання» нагадає деталі.")
+
+scheduler = Scheduler(SCHEDULE_STATE if WORKER_COUNT == 1 else f"{SCHEDULE_STATE}.{WORKER_INDEX}")
+scheduler.add("debts", REMIND_DEBT_DAYS * 86400,
+              lambda since, now: reminders.remind_debts(since, now, _debt_text))
+if REMIND_IDLE_DAYS > 0:
+    scheduler.add("idle", REMIND_CHECK_MIN * 60,
+                  lambda since, now: reminders.nudge_idle(since, now, _idle_text))
+
+@rt.message(Command("schedule"))
+async def schedule_cmd(m: types.Message):
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    args = (m.text or "").split()[1:]
+    if args[:1] == ["run"] and len(args) == 2:
+        if not scheduler.run_soon(args[1]):
+            await m.answer(f"Немає задачі «{args[1]}». Є: {', '.join(scheduler.jobs) or '—'}")
+            return
+        await m.answer(f"▶ Задача {args[1]} запуститься зараз.")
+        return
+    await m.answer(f"{scheduler.text()}\n"
+                   f"Боржників: {len(reminders.debtors)} | В індексі активності: {len(reminders.activity)}")
+
+# ================== ЧЕРГА В АДМІН-ГРУПУ ==================
+# Група приймає ~20 повідомлень/хв. З ADMIN_BATCH_WINDOW > 0 звіти, що прийшли
+# за вікно, ідуть одним альбомом + одним повідомленням із кнопками "#1", "#2"...
+_report_batch = []
+_report_timer = None
+
+def _report_keyboard(buttons, label=None):
+    kb = InlineKeyboardBuilder()
+    for text, data in buttons:
+        kb.button(text=text if label is None else f"{text.split()[0]} {label}", callback_data=data)
+    return kb
+
+def queue_report_card(photo_id: str, caption: str, buttons: list):
+    global _report_timer
+    if ADMIN_BATCH_WINDOW <= 0:
+        kb = _report_keyboard(buttons)
+        kb.adjust(3)
+        outbox.send_photo(ADMIN_CHAT_ID, photo_id, caption=caption, reply_markup=kb.as_markup(), priority=PRIO_REPORT)
+        return
+    _report_batch.append((photo_id, caption, buttons))
+    if len(_report_batch) >= 10:            # більше не влізе в один альбом
+        flush_report_cards()
+    elif _report_timer is None:
+        _report_timer = asyncio.get_running_loop().call_later(ADMIN_BATCH_WINDOW, flush_report_cards)
+
+def flush_report_cards():
+    global _report_timer
+    if _report_timer is not None:
+        _report_timer.cancel()
+        _report_timer = None
+    batch = _report_batch[:]
+    _report_batch.clear()
+    if len(batch) == 1:
+        photo_id, caption, buttons = batch[0]
+        kb = _report_keyboard(buttons)
+        kb.adjust(3)
+        outbox.send_photo(ADMIN_CHAT_ID, photo_id, caption=caption, reply_markup=kb.as_markup(), priority=PRIO_REPORT)
+        return
+    if not batch:
+        return
+    media = [types.InputMediaPhoto(media=p, caption=f"#{i}\n{cap}") for i, (p, cap, _) in enumerate(batch, 1)]
+    kb = InlineKeyboardBuilder()
+    for i, (_, _, buttons) in enumerate(batch, 1):
+        kb.attach(_report_keyboard(buttons, label=f"#{i}"))
+    kb.adjust(3)
+    outbox.send_media_group(ADMIN_CHAT_ID, media, priority=PRIO_REPORT)
+    outbox.send_message(ADMIN_CHAT_ID, f"🗂 Звіти #1–#{len(batch)}: рішення по кожному 👇",
+                        reply_markup=kb.as_markup(), priority=PRIO_REPORT)
+
+async def close_card(call: types.CallbackQuery):
+    # прибираємо лише рядок кнопок цього рішення (у зведенні їх кілька)
+    markup = call.message.reply_markup
+    rows = [row for row in (markup.inline_keyboard if markup else [])
+            if not any(b.callback_data == call.data for b in row)]
+    await call.message.edit_reply_markup(reply_markup=types.InlineKeyboardMarkup(inline_keyboard=rows) if rows else None)
+
 # ================== ФОТО: ЗВІТИ ТА ОПЛАТА ==================
 REPORT_RE = re.compile(r"^\s*звіт\s*:\s*(старт|фініш)\s+(\d+)\s*$", re.I)
 
@@ -318,6 +827,14 @@ async def on_photo(m: types.Message):
             await m.answer("⚠ Дозволено 300–1200 стібків за один звіт.")
             return
 
+        # той самий знімок (Telegram дає йому той самий file_unique_id) — не шлемо адмінам удруге
+        largest = m.photo[-1]
+        seen = registry.find(largest.file_unique_id)
+        if seen is not None and seen[0] == uid:
+            when = datetime.fromtimestamp(seen[1]).strftime("%d.%m %H:%M")
+            await m.answer(f"⚠ Це фото вже було у твоєму звіті {when}. Надішли нове фото процесу.")
+            return
+
         # В адмін-групу
         cap = (
             f"📜 Фото-звіт\n"
@@ -325,58 +842,137 @@ async def on_photo(m: types.Message):
             f"📌 Тип: {kind}\n"
             f"🧵 Стібків: {stitches}"
         )
-        kb = InlineKeyboardBuilder()
-        kb.button(text="✅ Зарахувати", callback_data=f"okrep|{uid}|{kind}|{stitches}")
-        kb.button(text="❌ Відхилити",  callback_data=f"badrep|{uid}")
-        kb.button(text="⚠ Кара",       callback_data=f"punish|{uid}")
-        kb.adjust(3)
-        await bot.send_photo(ADMIN_CHAT_ID, m.photo[-1].file_id, caption=cap, reply_markup=kb.as_markup())
+        if len(GAMES.games) > 1:
+            cap += f"\n🎮 Гра: {game_name(uid)}"
+        if seen is not None:
+            cap += f"\n⚠ Це фото вже надсилав гравець ID {seen[0]} ({datetime.fromtimestamp(seen[1]).strftime('%d.%m %H:%M')})"
+        token = actions.open(uid, "report", kind=kind, stitches=stitches, game=active_game(uid))
+        buttons = [
+            ("✅ Зарахувати", f"okrep|{uid}|{token}"),
+            ("❌ Відхилити",  f"badrep|{uid}|{token}"),
+            ("⚠ Кара",       f"punish|{uid}|{token}"),
+        ]
+        sent = pick_size(m.photo, ADMIN_PHOTO_MAX_SIDE)
+        entry = registry.add(uid, largest.file_unique_id, largest.file_id, sent.file_id, kind, stitches, token)
+        reminders.seen(uid, entry["at"])
+        queue_report_card(sent.file_id, cap, buttons)
         await m.answer("🧾 Звіт надіслано адміну. Дякую!")
 
         # Автовидача наступного завдання після ФІНІШ
         if kind == "фініш":
             cur = db["progress"][uid]["current"]
-            if cur <= len(TASKS):
-                t = TASKS[cur - 1]
-                base = t["stitches"]
+            t = catalog_for(uid).task(cur)
+            if t is not None:
+                base = t.stitches
 
                 # Амулет / борг
                 base = apply_artifact_effects_on_next(uid, base)
                 debt = db["debts"].get(uid, 0)
                 if debt > 0:
                     take = min(debt, base // 2)   # не більше половини
-                    db["debts"][uid] = debt - take
+                    add_debt(uid, -take)
                     base = max(50, base - take)
 
-                save_db(db)
+                save_db()
                 await m.answer("🎯 Наступне завдання:", parse_mode=None)
-                await m.answer(task_card({**t, "stitches": base}), parse_mode="Markdown")
+                await m.answer(t.render(base), parse_mode="Markdown")
                 db["progress"][uid]["current"] = cur + 1
-                save_db(db)
+                touch("progress", uid)
+                ranks.update(uid, progress=board_progress(uid))
+                save_db()
             else:
                 await m.answer("🏁 Фінал! Усі завдання виконано. Ти — Майстриня Осердя ✨")
         return
 
     # --- Скрин оплати ---
     reg = db["registrations"].get(uid)
+    game = active_game(uid)
     if not reg:
-        db["pending"][uid] = {"game": "tayemnyci", "requested_at": datetime.now().isoformat(timespec="seconds")}
-        save_db(db)
+        db["pending"][uid] = {"game": game, "requested_at": datetime.now().isoformat(timespec="seconds")}
+        touch("pending", uid)
+        save_db()
 
     cap = (
         f"💳 Скриншот оплати\n"
         f"👤 {m.from_user.first_name} (@{m.from_user.username or '—'}) | ID {uid}\n"
-        f"🎮 Гра: {game_name('x')}\n"
+        f"🎮 Гра: {GAMES.name(game)}\n"
         f"💳 Картка: {PAYMENT_CARD}"
     )
+    token = actions.open(uid, "pay", game=game)
+    save_db()
     kb = InlineKeyboardBuilder()
-    kb.button(text="✅ Підтвердити оплату", callback_data=f"apprpay|{uid}")
-    kb.button(text="❌ Відхилити",          callback_data=f"declpay|{uid}")
+    kb.button(text="✅ Підтвердити оплату", callback_data=f"apprpay|{uid}|{token}")
+    kb.button(text="❌ Відхилити",          callback_data=f"declpay|{uid}|{token}")
     kb.adjust(2)
-    await bot.send_photo(ADMIN_CHAT_ID, m.photo[-1].file_id, caption=cap, reply_markup=kb.as_markup())
+    outbox.send_photo(ADMIN_CHAT_ID, m.photo[-1].file_id, caption=cap, reply_markup=kb.as_markup(), priority=PRIO_PAYMENT)
     await m.answer("✅ Скрин відправлено адміну. Статус дивись у «🧵 Статус»")
 
+# ================== ІСТОРІЯ ЗВІТІВ ==================
+# фото не завантажуються заново: у реєстрі вже є file_id, Telegram віддає їх зі свого кешу
+async def send_reports_page(uid: str, page: int):
+    # /reports приходить від адміна — рядки гравця middleware не підтягнув
+    if registry.read is not None:
+        reports = await writer.read(registry.read, uid)
+    else:
+        await writer.prefetch(uid)
+        reports = None
+    entries, pages = registry.page(uid, page, REPORTS_PAGE, reports)
+    page = min(max(page, 1), pages)
+    if not entries:
+        outbox.send_message(ADMIN_CHAT_ID, f"🗂 У гравця ID {uid} ще немає звітів.")
+        return
+    media = []
+    for r in entries:
+        status = ACTION_LABELS.get(r.get("st"), "⏳ Очікує")
+        when = datetime.fromtimestamp(r["at"]).strftime("%d.%m.%Y %H:%M")
+        photo = r.get("t", r["f"]) if ADMIN_PHOTO_MAX_SIDE > 0 else r["f"]
+        media.append(types.InputMediaPhoto(media=photo, caption=f"{when} | {r['k']} {r['s']} 🧵 | {status}"))
+    if len(media) == 1:
+        outbox.send_photo(ADMIN_CHAT_ID, media[0].media, caption=media[0].caption, priority=PRIO_ACTION)
+    else:
+        outbox.send_media_group(ADMIN_CHAT_ID, media, priority=PRIO_ACTION)
+    kb = InlineKeyboardBuilder()
+    if page > 1:
+        kb.button(text="◀ Новіші", callback_data=f"rpage|{uid}|{page - 1}")
+    if page < pages:
+        kb.button(text="Старіші ▶", callback_data=f"rpage|{uid}|{page + 1}")
+    outbox.send_message(ADMIN_CHAT_ID, f"🗂 Звіти ID {uid}: сторінка {page}/{pages}",
+                        reply_markup=kb.as_markup() if page > 1 or page < pages else None, priority=PRIO_ACTION)
+
+@rt.message(Command("reports"))
+async def reports_cmd(m: types.Message):
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    args = (m.text or "").split()[1:]
+    if not args or not args[0].isdigit():
+        await m.answer("Використання: /reports <ID гравця> [сторінка]")
+        return
+    page = int(args[1]) if len(args) > 1 and args[1].isdigit() else 1
+    await send_reports_page(args[0], page)
+
+# реєструється раніше за admin_actions, який ловить усі callback з "|"
+@rt.callback_query(F.data.startswith("rpage|"))
+async def reports_page(call: types.CallbackQuery):
+    _, uid, page = call.data.split("|")
+    await send_reports_page(uid, int(page))
+    await call.answer()
+
 # ================== ДІЇ АДМІНА (callback) ==================
+CARD_ACTIONS = {"report": ("okrep", "badrep", "punish"), "pay": ("apprpay", "declpay")}
+ACTION_LABELS = {
+    "okrep": "✅ Зараховано", "badrep": "❌ Відхилено", "punish": "⚠ Кара",
+    "apprpay": "✅ Оплату підтверджено", "declpay": "❌ Оплату відхилено",
+}
+
+async def _finish(call: types.CallbackQuery, aid, action: str):
+    if aid is not None:
+        actions.close(aid, f"{ACTION_LABELS[action]} ({call.from_user.first_name})")
+        if action in CARD_ACTIONS["report"]:
+            _, uid, token = call.data.split("|")
+            registry.set_status(uid, token, action)
+    await close_card(call)
+    await call.answer("ОК")
+
 @rt.callback_query(F.data.contains("|"))
 async def admin_actions(call: types.CallbackQuery):
     if call.message.chat.id != ADMIN_CHAT_ID:
@@ -385,70 +981,163 @@ async def admin_actions(call: types.CallbackQuery):
 
     parts = call.data.split("|")
     action = parts[0]
+    aid = kind = stitches = game = None
+
+    if len(parts) == 3:
+        aid = token_id(parts[2])
+        if aid is not None:
+            await writer.prefetch_row("actions", str(aid))
+        found = actions.lookup(parts[2])
+        if found is None:
+            await call.answer("⌛ Картка застаріла або вже оброблена.", show_alert=True)
+            await close_card(call)
+            return
+        aid, rec, result = found
+        if result is not None:
+            # повтор: друге натискання, інший адмін або повторна доставка — без БД і Bot API
+            await call.answer(f"Вже оброблено: {result}")
+            return
+        if action not in CARD_ACTIONS.get(rec["card"], ()):
+            await call.answer("Невідома дія", show_alert=True)
+            return
+        uid, kind, stitches, game = rec["uid"], rec.get("kind"), rec.get("stitches"), rec.get("game")
+    elif action == "okrep":
+        # картки, надіслані до появи id дій, працюють як раніше
+        _, uid, kind, stitches = parts
+    else:
+        _, uid = parts
 
     try:
         if action in ("apprpay", "declpay"):
-            _, uid = parts
+            # реєстрація й заявка — тієї гри, за яку платили, навіть якщо гравець уже перемкнувся
+            game = game or GAMES.default
+            game_put(uid, game, "pending", None)
             if action == "apprpay":
-                db["registrations"][uid] = {
-                    "game": "tayemnyci",
+                game_put(uid, game, "registrations", {
+                    "game": game,
                     "approved": True,
                     "approved_at": datetime.now().isoformat(timespec="seconds")
-                }
-                db["pending"].pop(uid, None)
-                save_db(db)
-                await bot.send_message(int(uid), "🎉 Оплату підтверджено! Стартуй у «🎯 Завдання».")
+                })
+                save_db()
+                reminders.seen(uid)
+                outbox.send_message(int(uid), f"🎉 Оплату підтверджено ({GAMES.name(game)})! Стартуй у «🎯 Завдання».")
             else:
-                db["pending"].pop(uid, None)
-                save_db(db)
-                await bot.send_message(int(uid), "❌ Оплату не підтверджено. Спробуй ще або напиши адміну.")
-            await call.message.edit_reply_markup(reply_markup=None)
-            await call.answer("ОК")
+                save_db()
+                outbox.send_message(int(uid), "❌ Оплату не підтверджено. Спробуй ще або напиши адміну.")
+            await _finish(call, aid, action)
 
         elif action == "okrep":
-            _, uid, kind, stitches = parts
             stitches = int(stitches)
             db["stats"].setdefault(uid, {"name": "", "username": "", "reports": 0, "stitches_total": 0})
             db["stats"][uid]["reports"]        = db["stats"][uid].get("reports", 0) + 1
             db["stats"][uid]["stitches_total"] = db["stats"][uid].get("stitches_total", 0) + stitches
-            save_db(db)
-            await bot.send_message(int(uid), f"✅ Зараховано {stitches} стібків ({kind}). Молодчинка! 🧵")
-            await call.message.edit_reply_markup(reply_markup=None)
-            await call.answer("ОК")
+            touch("stats", uid)
+            ranks.update(uid, stats=db["stats"][uid])
+            save_db()
+            outbox.send_message(int(uid), f"✅ Зараховано {stitches} стібків ({kind}). Молодчинка! 🧵")
+            await _finish(call, aid, action)
 
         elif action == "badrep":
-            _, uid = parts
             debt_add = 150
-            inv = db["inventory"].setdefault(uid, {})
+            # ножиці — з інвентаря тієї ж гри, що й звіт (гравець міг відтоді перемкнутися)
+            game = game or active_game(uid)
+            inv = game_get(uid, game, "inventory") or {}
             if inv.get("scissors_fate", 0) > 0:
                 inv["scissors_fate"] -= 1
                 if inv["scissors_fate"] <= 0:
                     inv.pop("scissors_fate", None)
+                game_put(uid, game, "inventory", inv)
                 msg = "✂ Кара знята ножицями долі. Штраф не накладено."
             else:
-                db["debts"][uid] = db["debts"].get(uid, 0) + debt_add
+                add_debt(uid, debt_add, game)
                 msg = f"⚠ Звіт відхилено. Накладено борг: +{debt_add} стібків."
-            save_db(db)
-            await bot.send_message(int(uid), msg)
-            await call.message.edit_reply_markup(reply_markup=None)
-            await call.answer("ОК")
+            save_db()
+            outbox.send_message(int(uid), msg)
+            await _finish(call, aid, action)
 
         elif action == "punish":
-            _, uid = parts
-            db["debts"][uid] = db["debts"].get(uid, 0) + 200
-            save_db(db)
-            await bot.send_message(int(uid), "🕯 Містична кара: +200 боргу стібків.")
-            await call.message.edit_reply_markup(reply_markup=None)
-            await call.answer("ОК")
+            add_debt(uid, 200, game)
+            save_db()
+            outbox.send_message(int(uid), "🕯 Містична кара: +200 боргу стібків.")
+            await _finish(call, aid, action)
 
     except Exception as e:
         await call.answer(str(e), show_alert=True)
 
+# ================== ЕКСПОРТ ==================
+EXPORT_HELP = ("Формат: /export [csv|json] [approved] [chapter=N] [game=КОД] [from=РРРР-ММ-ДД] [to=РРРР-ММ-ДД]\n"
+               "Напр.: /export approved chapter=2 або /export json from=2026-01-01")
+_export_lock = asyncio.Lock()
+
+@rt.message(Command("export"))
+async def export_cmd(m: types.Message):
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    tokens = (m.text or "").split()[1:]
+    try:
+        fmt, flt = parse_filters(tokens)
+    except ValueError:
+        await m.answer(EXPORT_HELP)
+        return
+    if _export_lock.locked():
+        await m.answer("⏳ Попереднє вивантаження ще готується.")
+        return
+    async with _export_lock:
+        t0 = time.perf_counter()
+        fd, path = tempfile.mkstemp(prefix="tvorcha-export-", suffix="." + fmt)
+        os.close(fd)
+        try:
+            if DB_BACKEND == "sqlite":
+                # файл пишеться з таблиць — спершу скидаємо ще не записані зміни
+                await writer.flush()
+                rows = sqlite_rows(store)
+            else:
+                # рядки копіює loop сторінками — потік не торкається живих розділів
+                rows = dict_rows(db, player_keys(db), asyncio.get_running_loop())
+            count = await asyncio.get_running_loop().run_in_executor(
+                None, write_export, rows, path, fmt, flt, game_chapter, GAMES.default)
+            name = f"players-{datetime.now():%Y%m%d-%H%M}.{fmt}"
+            caption = (f"📤 Гравців: {count} | {' '.join(tokens) or 'усі'} | "
+                       f"{os.path.getsize(path) / 1024:.0f} КБ за {time.perf_counter() - t0:.1f} с")
+            await outbox.call(m.chat.id, lambda: bot.send_document(
+                m.chat.id, FSInputFile(path, filename=name), caption=caption), PRIO_ACTION)
+        except Exception as e:
+            logging.exception("export failed")
+            await m.answer(f"❌ Не вдалося вивантажити: {e}")
+        finally:
+            os.unlink(path)
+
 # ================== ДІАГНОСТИКА ==================
 @rt.message(Command("id"))
 async def show_id(m: types.Message):
     await m.answer(f"chat_id: {m.chat.id}")
 
+@rt.message(Command("rolls"))
+async def rolls_log(m: types.Message):
+    # /rolls <ID> — останні кидки гравця, кожен перераховано з секрету
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    arg = (m.text or "").split()[1:]
+    if not arg or not arg[0].isdigit():
+        await m.answer("Формат: /rolls <ID гравця>")
+        return
+    uid = arg[0]
+    if WORKER_SOCKET:
+        # /rolls іде в процес 0, а гравець може належати іншому — його рядок тут у кеші застарів
+        rec = json.loads(await writer.read(store.read_row, "rolls", uid) or "null")
+    else:
+        await writer.prefetch(uid)
+        rec = db["rolls"].get(uid)
+    if not rec:
+        await m.answer(f"ID {uid} ще не кидав кубик.")
+        return
+    lines = [f"🎲 Кидки ID {uid}: усього {rec['n']}, останні {min(10, len(rec['log']))}"]
+    for n, at, val, bead, *extra in rec["log"][-10:]:
+        ok = face(draws(DICE_KEY, uid, n)[0], BEAD_BIAS if bead else 0.0) == val
+        lines.append(f"#{n} {datetime.fromtimestamp(at).strftime('%d.%m %H:%M')} → {val}"
+                     f"{' 📿' if bead else ''}{' ' + extra[0] if extra else ''} {'✅' if ok else '❌'}")
+    await m.answer("\n".join(lines))
+
 @rt.message(Command("test_admin"))
 async def test_admin(m: types.Message):
     try:
@@ -457,56 +1146,97 @@ async def test_admin(m: types.Message):
     except Exception as e:
         await m.answer(f"❌ Не зміг надіслати в адмін-групу: {e}")
 
-# ================== WEBHOOK для Render ==================
-async def handle_webhook(request: web.Request):
-    try:
-        data = await request.json()
-        update = types.Update(**data)
-        await dp.feed_update(bot, update)
-        return web.Response(text="ok")
-    except Exception as e:
-        logging.exception(f"Webhook handle error: {e}")
-        return web.Response(status=500, text="error")
-
-app = web.Application()
-app.router.add_post(f"/{BOT_TOKEN}", handle_webhook)
-
-async def on_startup(app_: web.Application):
-    base_url = os.getenv("RENDER_EXTERNAL_URL", "https://tvorcha-bot.onrender.com")
-    webhook_url = f"{base_url}/{BOT_TOKEN}"
-    await bot.set_webhook(webhook_url)
-    logging.info(f"✅ Webhook set: {webhook_url}")
-
-async def on_shutdown(app_: web.Application):
-    try:
-        await bot.delete_webhook()
-        await bot.session.close()
-    except Exception:
-        pass
-    logging.info("🛑 Webhook removed, bot session closed")
-
-app.on_startup.append(on_startup)
-app.on_shutdown.append(on_shutdown)
-
-# ------------------ WEBHOOK ONLY (Render) ------------------
-import os
-import logging
-from aiogram import types
-from aiohttp import web
-
-logging.basicConfig(level=logging.INFO)
+@rt.message(Command("catalog"))
+async def catalog_info(m: types.Message):
+    if m.chat.id != ADMIN_CHAT_ID:
+        return
+    if "reload" in (m.text or ""):
+        await quests_watcher.check()
+        GAMES.clear()
+    cat = CATALOG
+    loaded = datetime.fromtimestamp(cat.loaded_at).isoformat(timespec="seconds")
+    lines = [
+        f"📚 Каталог: {cat.label}",
+        f"Завдань: {len(cat)} | Глав: {len(cat.chapters)} | Артефактів: {len(cat.artifacts)}",
+        f"Завантажено: {loaded}",
+    ]
+    if quests_watcher.last_error:
+        lines.append(f"⚠ Остання спроба оновлення: {quests_watcher.last_error}")
+    if len(GAMES.games) > 1:
+        lines += ["🎮 Ігри:", GAMES.text()]
+    await m.answer("\n".join(lines))
 
+# ================== WEBHOOK для Render ==================
 # healthcheck (GET) — щоб перевіряти у браузері
 async def handle_health(request: web.Request):
     return web.Response(text="ok")
 
+# апдейти одного гравця обробляються строго по черзі (звіт, кнопки адміна, кубик),
+# щоб два швидкі "фініші" не пропустили одне завдання і не списали борг двічі
+player_locks = KeyedLocks()
+
+async def process_update(update: types.Update):
+    # апдейти, що прийшли під час завантаження, чекають тут (у черзі пулу), а не отримують 503
+    if not state_ready.is_set():
+        await state_ready.wait()
+    async with player_locks.hold(update_player(update)) as waited:
+        M_LOCK_WAIT.observe(waited)
+        if waited > 1:
+            logging.info(f"⏳ update {update.update_id}: waited {waited:.2f}s for player lock")
+        await dp.feed_update(bot, update)
+
+# вебхук лише ставить апдейт у чергу й одразу відповідає 200,
+# щоб повільні запити до Bot API не змушували Telegram повторювати доставку
+recent_updates = RecentIds(UPDATE_DEDUP_SIZE)
+update_pool = WorkerPool(process_update, workers=UPDATE_WORKERS, maxsize=UPDATE_QUEUE_SIZE, name="update") if UPDATE_WORKERS > 0 else None
+
+METRICS.gauge("bot_update_queue_depth", "Апдейти в черзі на обробку", lambda: update_pool.depth if update_pool else 0)
+METRICS.gauge("bot_update_workers_busy", "Зайняті обробники апдейтів", lambda: update_pool.busy if update_pool else 0)
+METRICS.counter_fn("bot_update_rejected_total", "Апдейти, відхилені через повну чергу", lambda: update_pool.rejected if update_pool else 0)
+METRICS.counter_fn("bot_update_duplicates_total", "Повторні доставки апдейтів", lambda: recent_updates.duplicates)
+METRICS.gauge("bot_outbound_queue_depth", "Повідомлення в черзі до Bot API", lambda: outbox.depth)
+METRICS.gauge("bot_player_locks_active", "Гравці з апдейтами в обробці", lambda: player_locks.active)
+METRICS.gauge("bot_report_batch_size", "Звіти, що чекають на зведення в адмін-групу", lambda: len(_report_batch))
+
+async def handle_metrics(request: web.Request):
+    return web.Response(text=METRICS.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+async def handle_stats(request: web.Request):
+    return web.json_response({
+        "player_locks": player_locks.stats(),
+        "storage": {"backend": DB_BACKEND, "bytes_written": store.bytes_written, "flushes": writer.flushes},
+        "fsm": {"cached": len(fsm_storage.store.cache), "flushes": fsm_storage.writer.flushes},
+        "updates": update_pool.stats() if update_pool else None,
+        "duplicates": recent_updates.duplicates,
+        "outbound": outbox.stats(),
+        "broadcast": broadcaster.state,
+        "actions": actions.stats() if actions else None,
+        "reports_indexed": len(registry) if registry else None,
+        "reminders": {"debtors": len(reminders.debtors), "activity": len(reminders.activity), "jobs": scheduler.state},
+        "ready": state_ready.is_set(),
+    })
+
+async def accept_update(data: dict) -> bool:
+    # False — черга переповнена, апдейт треба доставити ще раз
+    if not recent_updates.add(data.get("update_id")):
+        return True
+    update = types.Update(**data)
+    if update_pool is None:
+        await process_update(update)
+    elif not update_pool.submit(update):
+        recent_updates.forget(update.update_id)
+        return False
+    return True
+
 # приймаємо апдейти від Telegram (POST)
 async def handle_webhook(request: web.Request):
     try:
         data = await request.json()
         logging.info(f"⬇ update: {data.get('update_id')} {list(data.keys())}")
-        update = types.Update(**data)
-        await dp.feed_update(bot, update)
+        if not await accept_update(data):
+            # черга переповнена — хай Telegram повторить пізніше
+            return web.Response(status=503, text="busy", headers={"Retry-After": "5"})
         return web.Response(text="ok")
     except Exception as e:
         logging.exception(f"Webhook handle error: {e}")
@@ -514,32 +1244,131 @@ async def handle_webhook(request: web.Request):
 
 app = web.Application()
 app.router.add_post(f'/{BOT_TOKEN}', handle_webhook)
-app.router.add_get("/", lambda r: web.Response(text="ok"))
+app.router.add_get("/", handle_health)
+app.router.add_get("/stats", handle_stats)
+app.router.add_get("/metrics", handle_metrics)
+
+def _load_ranks():
+    # у потоці: читання розділів і побудова (сортування, глави) — loop лише підміняє посилання
+    fresh = Leaderboard(chapter_of, top_n=TOP_SIZE)
+    fresh.build(store.dump_section("stats"), store.dump_section("progress"))
+    off_board(fresh, store.dump_section("games"))
+    return fresh
+
+async def refresh_ranks():
+    # у кластері інші процеси змінюють своїх гравців — періодично перечитуємо рейтинг зі спільної БД
+    global ranks
+    while True:
+        await asyncio.sleep(RANKS_REFRESH_SEC)
+        try:
+            fresh = await asyncio.get_running_loop().run_in_executor(None, _load_ranks)
+        except Exception:
+            logging.exception("ranks refresh failed")
+            continue
+        ranks = fresh
+
+_background = []
+_boot = None
+
+async def boot():
+    # важка частина старту — вже після того, як сервер приймає запити
+    try:
+        await writer.read(load_state)
+    except Exception:
+        logging.exception("state load failed")
+        os.kill(os.getpid(), signal.SIGTERM)    # без БД працювати нема як — хай платформа перезапустить
+        return
+    state_ready.set()
+    quests_watcher.start()
+    scheduler.load()
+    scheduler.start()
+    if WORKER_SOCKET and RANKS_REFRESH_SEC > 0:
+        _background.append(asyncio.get_running_loop().create_task(refresh_ranks(), name="ranks-refresh"))
+    # розсилка, яку перервав перезапуск, продовжується з курсора (у кластері — лише процес 0)
+    state = broadcaster.load()
+    if state and state["status"] == "running" and WORKER_INDEX == 0:
+        await broadcaster.resume()
+
+async def start_services():
+    global _boot
+    writer.start()
+    fsm_storage.start()
+    if update_pool:
+        update_pool.start()
+    _boot = asyncio.get_running_loop().create_task(boot(), name="boot")
+
+async def stop_services():
+    if _boot is not None:
+        # завантаження в потоці не перервати — дочекаємося, щоб закриття писало в готове сховище
+        await asyncio.wait([_boot])
+    for task in _background:
+        task.cancel()
+    if update_pool:
+        await update_pool.stop()
+    await broadcaster.stop(shutdown=True)
+    await scheduler.stop()
+    flush_report_cards()
+    await outbox.close()
+    try:
+        await bot.session.close()
+    except Exception:
+        pass
+    if quests_watcher:
+        await quests_watcher.stop()
+    await fsm_storage.close()
+    await writer.close()
 
-async def on_startup(app_: web.Application):
+async def setup_webhook():
     base_url = os.getenv("RENDER_EXTERNAL_URL", "").strip() or "https://tvorcha-bot.onrender.com"
     webhook_url = f"{base_url}/{BOT_TOKEN}"
     try:
-        await bot.delete_webhook(drop_pending_updates=False)
+        if await ensure_webhook(bot, webhook_url, ALLOWED_UPDATES):
+            logging.info(f"✅ Webhook set: {webhook_url}")
+        else:
+            logging.info(f"✅ Webhook already set: {webhook_url}")
     except Exception:
-        pass
-    await bot.set_webhook(webhook_url, allowed_updates=["message","callback_query"])
-    logging.info(f"✅ Webhook set: {webhook_url}")
+        logging.exception("webhook setup failed")
+
+async def on_startup(app_: web.Application):
+    # run_app відкриває порт лише після on_startup — тут нічого не чекаємо
+    await start_services()
+    _background.append(asyncio.get_running_loop().create_task(setup_webhook(), name="webhook"))
 
 async def on_shutdown(app_: web.Application):
-    try:
-        await bot.delete_webhook()
-        await bot.session.close()
-    except Exception:
-        pass
-    logging.info("🛑 Webhook removed, bot session closed")
+    # вебхук не знімаємо: поки процес перезапускається, Telegram тримає апдейти у себе
+    # і повторює доставку, а наступний старт не витрачає час на set_webhook
+    await stop_services()
+    logging.info("🛑 Bot stopped, session closed")
 
 app.on_startup.append(on_startup)
 app.on_shutdown.append(on_shutdown)
 
+async def run_worker():
+    # процес кластера: апдейти приходять від cluster.py через Unix-сокет, вебхук ставить фронт
+    await start_services()
+    server = await serve_frames(WORKER_SOCKET, lambda body: accept_update(json.loads(body)))
+    # /metrics процесу — лише для фронта: cluster.py зводить усі процеси в один /metrics
+    metrics_app = web.Application()
+    metrics_app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(metrics_app, access_log=None)
+    await runner.setup()
+    await web.UnixSite(runner, WORKER_SOCKET + ".metrics").start()
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    logging.info(f"worker {WORKER_INDEX} listening on {WORKER_SOCKET}")
+    await stop.wait()
+    server.close()
+    await server.wait_closed()
+    await runner.cleanup()
+    await stop_services()
+
 if __name__ == "__main__":
-    port = int(os.getenv("PORT", "10000"))
-    web.run_app(app, host="0.0.0.0", port=port)
+    if WORKER_SOCKET:
+        asyncio.run(run_worker())
+    else:
+        port = int(os.getenv("PORT", "10000"))
+        web.run_app(app, host="0.0.0.0", port=port)
 
 
 
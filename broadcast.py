@@ -0,0 +1,191 @@
+# broadcast.py
+# Масова розсилка всім гравцям через Outbound.
+#
+# Отримувачі читаються зі сховища потоком у порядку uid, відправка — вікном
+# із кількох десятків одночасних повідомлень і власним TokenBucket трохи
+# нижче глобального ліміту Telegram, щоб відповіді гравцям не стояли в черзі.
+# Курсор (останній uid, до якого все вже відправлено) пишеться на диск, тож
+# після перезапуску розсилка продовжується з того ж місця; повторно можуть
+# піти лише ті кілька повідомлень, що були "в польоті".
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+
+from outbound import TokenBucket, PRIO_BULK, PRIO_ACTION
+from storage import atomic_write
+
+
+class Broadcast:
+    def __init__(self, outbox, recipients, path: str, admin_chat: int,
+                 rate: float = 25, window: int = 50, report_every: float = 15):
+        self.outbox = outbox
+        self.recipients = recipients    # recipients(after_uid) -> ітератор int uid за зростанням
+        self.path = path
+        self.admin_chat = admin_chat
+        self.rate = rate
+        self.window = window
+        self.report_every = report_every
+        self.state = None
+        self._task = None
+        self._resume_later = False
+
+    # ---------- стан ----------
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = None
+        return self.state
+
+    def _dump(self) -> bytes:
+        return json.dumps(self.state, ensure_ascii=False).encode("utf-8")
+
+    async def _save(self):
+        data = self._dump()
+        await asyncio.get_running_loop().run_in_executor(None, atomic_write, self.path, data)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # ---------- керування ----------
+    async def start(self, text: str):
+        if self.running:
+            raise RuntimeError("розсилка вже йде")
+        self.state = {
+            "text": text,
+            "cursor": 0,
+            "sent": 0,
+            "failed": 0,
+            "blocked": 0,
+            "status": "running",
+            "started_at": time.time(),
+            "elapsed": 0.0,
+            "status_msg": None,
+        }
+        await self._save()
+        self._spawn()
+
+    async def resume(self) -> bool:
+        # після перезапуску або /broadcast_resume
+        if self.running or not self.state or self.state["status"] == "done":
+            return False
+        self.state["status"] = "running"
+        await self._save()
+        self._spawn()
+        return True
+
+    async def stop(self, shutdown: bool = False):
+        # пауза: курсор лишається на диску, resume() продовжить;
+        # shutdown=True — статус лишається "running", і після старту розсилка піде далі сама
+        if not self.running:
+            return
+        self._resume_later = shutdown
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def _spawn(self):
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="broadcast")
+
+    # ---------- відправка ----------
+    async def _run(self):
+        st = self.state
+        bucket = TokenBucket(self.rate, self.rate)
+        inflight = deque()          # (uid, future) у порядку відправки
+        t0 = time.monotonic() - st["elapsed"]
+        last_report = 0.0
+        last_save = time.monotonic()
+
+        def settle():
+            # курсор рухається лише по завершених підряд — дірок після перезапуску не буде
+            while inflight and inflight[0][1].done() and not inflight[0][1].cancelled():
+                uid, fut = inflight.popleft()
+                exc = fut.exception()
+                if exc is None:
+                    st["sent"] += 1
+                elif isinstance(exc, TelegramForbiddenError):
+                    st["blocked"] += 1
+                else:
+                    st["failed"] += 1
+                    if not isinstance(exc, TelegramBadRequest):
+                        logging.warning(f"broadcast {uid}: {type(exc).__name__}: {exc}")
+                st["cursor"] = uid
+            st["elapsed"] = time.monotonic() - t0
+
+        try:
+            await self._report()
+            for uid in self.recipients(st["cursor"]):
+                while len(inflight) >= self.window:
+                    await asyncio.wait([inflight[0][1]])
+                    settle()
+                # після 429 чекаємо разом з Outbound, а не додаємо нові повідомлення в чергу
+                flood = self.outbox.flood_until - time.monotonic()
+                if flood > 0:
+                    await asyncio.sleep(flood)
+                await bucket.take()
+                inflight.append((uid, self.outbox.send_message(uid, st["text"], priority=PRIO_BULK)))
+                settle()
+                now = time.monotonic()
+                if now - last_save >= 2:
+                    last_save = now
+                    await self._save()
+                if now - last_report >= self.report_every:
+                    last_report = now
+                    await self._report()
+            while inflight:
+                await asyncio.wait([inflight[0][1]])
+                settle()
+            st["status"] = "done"
+        except asyncio.CancelledError:
+            settle()
+            # ще не відправлене з черги Outbound знімаємо: після resume воно піде заново
+            for _, fut in inflight:
+                fut.cancel()
+            if not self._resume_later:
+                st["status"] = "paused"
+            raise
+        except Exception:
+            settle()
+            st["status"] = "paused"
+            logging.exception("broadcast failed")
+        finally:
+            await self._save()
+            if not self._resume_later:
+                await self._report()
+
+    # ---------- звіт в адмін-чат ----------
+    def progress_text(self) -> str:
+        st = self.state
+        if not st:
+            return "📣 Розсилок ще не було."
+        done = st["sent"] + st["failed"] + st["blocked"]
+        speed = done / st["elapsed"] if st["elapsed"] > 0 else 0.0
+        title = {"running": "📣 Розсилка йде", "paused": "⏸ Розсилку призупинено", "done": "✅ Розсилку завершено"}
+        return (
+            f"{title.get(st['status'], st['status'])}\n"
+            f"Надіслано: {st['sent']} | Заблокували бота: {st['blocked']} | Помилки: {st['failed']}\n"
+            f"Швидкість: {speed:.1f} повідомл./с | Час: {int(st['elapsed'])} с\n"
+            f"Курсор: ID {st['cursor']}"
+        )
+
+    async def _report(self):
+        # одне повідомлення в адмін-групі, яке далі лише редагується
+        st = self.state
+        text = self.progress_text()
+        try:
+            if st.get("status_msg"):
+                self.outbox.call(self.admin_chat, lambda: self.outbox.bot.edit_message_text(
+                    text, chat_id=self.admin_chat, message_id=st["status_msg"]), PRIO_ACTION)
+            else:
+                msg = await self.outbox.send_message(self.admin_chat, text)
+                st["status_msg"] = msg.message_id
+        except Exception as e:
+            logging.warning(f"broadcast report failed: {e}")
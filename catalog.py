@@ -0,0 +1,203 @@
+# catalog.py
+# Скомпільований каталог квестів: будується один раз із JSON і далі лише читається.
+#
+# Задачі — компактні записи зі __slots__, пошук за номером/кодом/главою — через
+# масив або dict, таблиця кубика — масив за значенням, картка завдання
+# зібрана наперед, підставляється лише кількість стібків.
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+
+
+class Task:
+    __slots__ = ("id", "code", "title", "text", "stitches", "tech", "color", "keyword",
+                 "dice_event", "artifact_hint", "chapter", "_head", "_tail", "card")
+
+    def __init__(self, raw: dict, chapter: int):
+        self.id = int(raw["id"])
+        self.code = raw.get("code") or f"Q{self.id:03d}"
+        self.title = raw["title"]
+        self.text = raw["text"]
+        self.stitches = int(raw["stitches"])
+        self.tech = raw.get("tech", "")
+        self.color = raw.get("color", "")
+        self.keyword = raw.get("keyword", "")
+        self.dice_event = bool(raw.get("dice_event"))
+        self.artifact_hint = bool(raw.get("artifact_hint"))
+        self.chapter = chapter
+
+        # картка ділиться на дві частини навколо кількості стібків
+        self._head = "\n".join([f"Завдання #{self.id} — {self.title}", self.text, "🧵 Стібків: "])
+        tail = [f" | Техніка: {self.tech} | Колір: {self.color}", f"🔑 Ключове слово: {self.keyword}"]
+        if self.dice_event:
+            tail.append("🎲 Подія: на цьому етапі доступний кидок кубика.")
+        self._tail = "\n".join(tail)
+        self.card = self.render(self.stitches)
+
+    def render(self, stitches: int) -> str:
+        return f"{self._head}{stitches}{self._tail}"
+
+
+class Chapter:
+    __slots__ = ("index", "name", "first", "last")
+
+    def __init__(self, index: int, name: str, first: int, last: int):
+        self.index = index
+        self.name = name
+        self.first = first
+        self.last = last
+
+
+class Catalog:
+    def __init__(self, data: dict, digest: str = ""):
+        validate(data)
+        self.loaded_at = time.time()
+        self.game = data.get("game", "")
+        self.version = str(data.get("version", ""))
+        self.digest = digest
+
+        raw_tasks = sorted(data.get("tasks", []), key=lambda t: int(t["id"]))
+        chapters = data.get("chapters") or [{"name": "", "from": 1, "to": len(raw_tasks)}]
+        self.chapters = tuple(Chapter(i, c["name"], int(c["from"]), int(c["to"])) for i, c in enumerate(chapters, 1))
+
+        def chapter_of(task_id):
+            for c in self.chapters:
+                if c.first <= task_id <= c.last:
+                    return c.index
+            return 0
+
+        # прогрес гравця — 1-based номер у tasks; self.tasks[0] — заглушка
+        self.tasks = (None,) + tuple(Task(t, chapter_of(int(t["id"]))) for t in raw_tasks)
+        self.by_id = {t.id: t for t in self.tasks[1:]}
+        self.by_code = {t.code: t for t in self.tasks[1:]}
+
+        self.artifacts = {a["code"]: a for a in data.get("artifacts", [])}
+        self.artifact_codes = tuple(self.artifacts)
+        self.artifact_index = {code: i for i, code in enumerate(self.artifact_codes)}
+
+        dice = {int(d["value"]): d.get("effect", "—") for d in data.get("dice_outcomes", []) if "value" in d}
+        self.dice = tuple(dice.get(v, "—") for v in range(7))
+
+    def __len__(self) -> int:
+        return len(self.tasks) - 1
+
+    def task(self, number: int):
+        # None — якщо гравець уже пройшов усі завдання
+        return self.tasks[number] if 0 < number < len(self.tasks) else None
+
+    def chapter(self, index: int):
+        return self.chapters[index - 1] if 0 < index <= len(self.chapters) else None
+
+    def dice_effect(self, value: int) -> str:
+        return self.dice[value] if 0 <= value < len(self.dice) else "—"
+
+    @property
+    def label(self) -> str:
+        return f"{self.game} v{self.version} ({self.digest[:8]})" if self.digest else f"{self.game} v{self.version}"
+
+
+def validate(data: dict):
+    # ловимо помилки редагування до того, як каталог потрапить у гру
+    tasks = data.get("tasks")
+    if not isinstance(tasks, list) or not tasks:
+        raise ValueError("tasks: порожній список")
+    ids = set()
+    for t in tasks:
+        for field in ("id", "title", "text", "stitches"):
+            if field not in t:
+                raise ValueError(f"task {t.get('id', '?')}: немає поля {field}")
+        if int(t["id"]) in ids:
+            raise ValueError(f"task {t['id']}: id повторюється")
+        ids.add(int(t["id"]))
+        if int(t["stitches"]) <= 0:
+            raise ValueError(f"task {t['id']}: stitches має бути > 0")
+    for a in data.get("artifacts", []):
+        if "code" not in a or "name" not in a:
+            raise ValueError(f"artifact {a}: потрібні code і name")
+    for d in data.get("dice_outcomes", []):
+        if not 1 <= int(d.get("value", 0)) <= 6:
+            raise ValueError(f"dice_outcomes: значення {d.get('value')} поза 1..6")
+
+
+def load_catalog(path: str, fallback: dict = None) -> Catalog:
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        if fallback is None:
+            raise
+        return Catalog(fallback, digest="")
+    return Catalog(json.loads(raw), digest=hashlib.sha1(raw).hexdigest())
+
+
+class CatalogWatcher:
+    """Стежить за файлом квестів і підміняє каталог без перезапуску.
+
+    Перевірка mtime, читання, хеш і компіляція — в окремому потоці; у loop
+    виконується лише on_swap(новий_каталог), тобто одне присвоєння посилання.
+    """
+
+    def __init__(self, path: str, current: Catalog, on_swap, interval: float = 5.0):
+        self.path = path
+        self.current = current
+        self.on_swap = on_swap
+        self.interval = interval
+        self.last_error = None
+        self.checked_at = None
+        self._stamp = self._stat()
+        self._task = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _check(self):
+        stamp = self._stat()
+        if stamp is None or stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest == self.current.digest:
+            return None  # торкнулися файлу, але вміст той самий
+        return Catalog(json.loads(raw), digest=digest)
+
+    async def check(self) -> bool:
+        try:
+            fresh = await asyncio.get_running_loop().run_in_executor(None, self._check)
+        except Exception as e:
+            # зламаний файл — лишаємо старий каталог, гра не зупиняється
+            self.last_error = f"{type(e).__name__}: {e}"
+            logging.error(f"quests reload failed: {self.last_error}")
+            return False
+        finally:
+            self.checked_at = time.time()
+        if fresh is None:
+            return False
+        self.last_error = None
+        self.current = fresh
+        self.on_swap(fresh)
+        logging.info(f"quests reloaded: {fresh.label}, {len(fresh)} tasks")
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def start(self):
+        if self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="quests-watcher")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,350 @@
+# cluster.py
+# Режим кількох процесів: python cluster.py замість python bot_main.py.
+#
+# Фронт-процес приймає вебхук, відсіює повтори і за uid гравця передає сирий
+# JSON апдейта одному з PROCESS_WORKERS процесів bot_main.py через локальний
+# Unix-сокет. Той самий гравець завжди потрапляє до того самого процесу, тож
+# порядок його апдейтів і замки гравця (dispatch.KeyedLocks) працюють як і в
+# одному процесі. Спільна БД — SQLite (WAL): кожен процес пише лише своїх
+# гравців, а адмін-команди (розсилка, вивантаження...) йдуть у процес 0.
+#
+# /metrics фронта — його власні лічильники плюс /metrics кожного процесу (процеси
+# віддають їх на сусідньому Unix-сокеті <сокет>.metrics) з міткою process.
+#
+# Кадр на сокеті: 4 байти довжини (big-endian) + JSON апдейта; відповідь —
+# 1 байт: 1 — прийнято, 0 — черга процесу повна (фронт відповідає 503).
+import os
+import sys
+import json
+import signal
+import asyncio
+import logging
+import tempfile
+from collections import deque
+
+import aiohttp
+from aiohttp import web
+
+from dispatch import RecentIds
+from metrics import Registry, merge
+from webhook import ensure_webhook
+
+ACK_OK = b"\x01"
+ACK_BUSY = b"\x00"
+
+
+# ---------- протокол ----------
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    head = await reader.readexactly(4)
+    return await reader.readexactly(int.from_bytes(head, "big"))
+
+
+async def serve_frames(path: str, handle):
+    """Сторона процесу-воркера: handle(body) -> bool для кожного кадру."""
+    async def on_conn(reader, writer):
+        try:
+            while True:
+                body = await read_frame(reader)
+                try:
+                    ok = await handle(body)
+                except Exception:
+                    logging.exception("cluster: bad frame")
+                    ok = True   # зіпсований апдейт не повторюємо
+                writer.write(ACK_OK if ok else ACK_BUSY)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    return await asyncio.start_unix_server(on_conn, path)
+
+
+# команди адмін-групи, що мають виконуватися в одному місці (процес 0): розсилка,
+# вивантаження, розклад тощо. Решта повідомлень у групі — звичайні апдейти
+# відправника: адмін може бути й гравцем, і його рядки пише лише "його" процес.
+ADMIN_COMMANDS = frozenset({"broadcast", "broadcast_stop", "broadcast_resume", "schedule", "reports",
+                            "export", "rolls", "catalog"})
+
+
+def _command(text: str):
+    # "/export@bot json" -> "export"
+    if not text.startswith("/"):
+        return None
+    words = text[1:].split(maxsplit=1)
+    return words[0].split("@", 1)[0] if words else None
+
+
+def route_key(data: dict, admin_chat: int):
+    # та сама логіка, що й bot_main.update_player, але над сирим JSON (без pydantic)
+    cb = data.get("callback_query")
+    if cb:
+        parts = (cb.get("data") or "").split("|")
+        if len(parts) > 1 and parts[1].isdigit():
+            return int(parts[1])
+        return cb.get("from", {}).get("id")
+    msg = data.get("message")
+    if msg:
+        if msg.get("chat", {}).get("id") == admin_chat and _command(msg.get("text") or "") in ADMIN_COMMANDS:
+            return None     # адмін-команди — завжди процес 0
+        return msg.get("from", {}).get("id")
+    return None
+
+
+class WorkerLink:
+    """З'єднання фронта з процесом-воркером.
+
+    Кадри конвеєрні: пишемо, не чекаючи попередніх відповідей, а окрема задача
+    читає байти-підтвердження і віддає їх очікувачам у тому ж порядку.
+    """
+
+    def __init__(self, index: int, path: str):
+        self.index = index
+        self.path = path
+        self.metrics_path = path + ".metrics"     # HTTP /metrics процесу (bot_main.run_worker)
+        self.proc = None
+        self.restarts = 0
+        self.delivered = 0
+        self.busy = 0
+        self._reader = self._writer = None
+        self._acks = None
+        self._pending = deque()
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        async with self._lock:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                self._acks = asyncio.get_running_loop().create_task(self._read_acks(self._reader))
+
+    async def _read_acks(self, reader):
+        try:
+            while True:
+                ack = await reader.readexactly(1)
+                fut = self._pending.popleft()
+                if not fut.done():
+                    fut.set_result(ack == ACK_OK)
+        except (OSError, asyncio.IncompleteReadError, IndexError):
+            if self._reader is reader:
+                self._drop()
+
+    async def deliver(self, body: bytes):
+        # True — прийнято, False — черга повна, None — процес недоступний
+        try:
+            await self._connect()
+        except OSError:
+            return None
+        fut = asyncio.get_running_loop().create_future()
+        # між append і write немає await — порядок відповідей збігається з порядком кадрів
+        self._pending.append(fut)
+        self._writer.write(len(body).to_bytes(4, "big") + body)
+        try:
+            await self._writer.drain()
+        except OSError:
+            self._drop()
+        ok = await fut
+        if ok:
+            self.delivered += 1
+        elif ok is False:
+            self.busy += 1
+        return ok
+
+    def _drop(self):
+        # зв'язок обірвано: усі, хто чекав підтвердження, отримують None (фронт відповість 503)
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        if self._acks is not None and self._acks is not asyncio.current_task():
+            self._acks.cancel()
+        self._acks = None
+        while self._pending:
+            fut = self._pending.popleft()
+            if not fut.done():
+                fut.set_result(None)
+
+    async def metrics(self):
+        # текст /metrics процесу або None, якщо він недоступний
+        try:
+            async with aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=self.metrics_path),
+                                             timeout=aiohttp.ClientTimeout(total=5)) as session:
+                async with session.get("http://worker/metrics") as resp:
+                    return await resp.text() if resp.status == 200 else None
+        except (OSError, aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "pid": self.proc.pid if self.proc else None,
+            "alive": self.proc is not None and self.proc.returncode is None,
+            "restarts": self.restarts,
+            "delivered": self.delivered,
+            "busy": self.busy,
+        }
+
+
+class Front:
+    def __init__(self, workers: int, sock_dir: str, admin_chat: int, dedup_size: int = 10000):
+        self.links = [WorkerLink(i, os.path.join(sock_dir, f"worker-{i}.sock")) for i in range(workers)]
+        self.admin_chat = admin_chat
+        self.recent = RecentIds(dedup_size)
+        self._stopping = False
+        self._supervisors = []
+        self.metrics = Registry()
+
+        def per_link(attr):
+            return lambda: {str(link.index): getattr(link, attr) for link in self.links}
+
+        self.metrics.gauge("bot_cluster_worker_up", "Процес-воркер живий", lambda: {
+            str(link.index): int(link.proc is not None and link.proc.returncode is None) for link in self.links}, ("worker",))
+        self.metrics.counter_fn("bot_cluster_worker_restarts_total", "Перезапуски процесу-воркера", per_link("restarts"), ("worker",))
+        self.metrics.counter_fn("bot_cluster_delivered_total", "Апдейти, прийняті процесом", per_link("delivered"), ("worker",))
+        self.metrics.counter_fn("bot_cluster_busy_total", "Апдейти, відхилені процесом (черга повна)", per_link("busy"), ("worker",))
+        self.metrics.counter_fn("bot_cluster_duplicates_total", "Повторні доставки, відсіяні фронтом", lambda: self.recent.duplicates)
+
+    def link_for(self, data: dict) -> WorkerLink:
+        key = route_key(data, self.admin_chat)
+        # uid — ціле число, тож остача стабільна між перезапусками (на відміну від hash(str))
+        return self.links[0 if key is None else key % len(self.links)]
+
+    # ---------- процеси ----------
+    def _env(self, link: WorkerLink) -> dict:
+        n = len(self.links)
+        env = dict(os.environ)
+        env.update({
+            "WORKER_SOCKET": link.path,
+            "WORKER_INDEX": str(link.index),
+            "WORKER_COUNT": str(n),
+            "DB_BACKEND": "sqlite",
+            # ліміти Telegram спільні на весь бот — ділимо між процесами
+            "OUT_GLOBAL_RATE": str(float(os.getenv("OUT_GLOBAL_RATE", "30")) / n),
+            "ADMIN_CHAT_PER_MIN": str(float(os.getenv("ADMIN_CHAT_PER_MIN", "20")) / n),
+        })
+        return env
+
+    async def _supervise(self, link: WorkerLink):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_main.py")
+        while not self._stopping:
+            link.proc = await asyncio.create_subprocess_exec(sys.executable, script, env=self._env(link))
+            code = await link.proc.wait()
+            link._drop()
+            if self._stopping:
+                return
+            link.restarts += 1
+            logging.error(f"cluster: worker {link.index} exited with {code}, restarting")
+            await asyncio.sleep(1)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for link in self.links:
+            if os.path.exists(link.path):
+                os.unlink(link.path)    # сокет від попереднього запуску — не ознака готовності
+            if os.path.exists(link.metrics_path):
+                os.unlink(link.metrics_path)
+        self._supervisors = [loop.create_task(self._supervise(link), name=f"worker-{link.index}")
+                             for link in self.links]
+        # чекаємо, поки всі воркери відкриють сокети (БД вони дочитують уже після цього)
+        for link in self.links:
+            while not os.path.exists(link.path):
+                if link.proc is not None and link.proc.returncode is not None:
+                    raise RuntimeError(f"worker {link.index} failed to start")
+                await asyncio.sleep(0.05)
+
+    async def stop(self, timeout: float = 30.0):
+        self._stopping = True
+        for link in self.links:
+            link._drop()
+            if link.proc is not None and link.proc.returncode is None:
+                link.proc.send_signal(signal.SIGTERM)
+        procs = [link.proc.wait() for link in self.links if link.proc is not None]
+        try:
+            await asyncio.wait_for(asyncio.gather(*procs), timeout)
+        except asyncio.TimeoutError:
+            for link in self.links:
+                if link.proc is not None and link.proc.returncode is None:
+                    link.proc.kill()
+        for task in self._supervisors:
+            task.cancel()
+
+    # ---------- HTTP ----------
+    async def handle_webhook(self, request: web.Request):
+        body = await request.read()
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return web.Response(status=400, text="bad json")
+        update_id = data.get("update_id")
+        if not self.recent.add(update_id):
+            return web.Response(text="ok")
+        ok = await self.link_for(data).deliver(body)
+        if not ok:
+            # воркер зайнятий або перезапускається — хай Telegram повторить пізніше
+            self.recent.forget(update_id)
+            return web.Response(status=503, text="busy", headers={"Retry-After": "5"})
+        return web.Response(text="ok")
+
+    async def handle_metrics(self, request: web.Request):
+        # метрики фронта + /metrics кожного живого процесу з міткою process
+        texts = await asyncio.gather(*(link.metrics() for link in self.links))
+        parts = [("front", self.metrics.render())]
+        parts += [(str(link.index), text) for link, text in zip(self.links, texts) if text is not None]
+        return web.Response(text=merge(parts), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def handle_stats(self, request: web.Request):
+        return web.json_response({
+            "cluster": [link.stats() for link in self.links],
+            "duplicates": self.recent.duplicates,
+        })
+
+
+def build_app() -> web.Application:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from storage import SqliteStore
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    token = os.getenv("BOT_TOKEN", "").strip()
+    if not token:
+        raise RuntimeError("Environment BOT_TOKEN is missing")
+    if os.getenv("DB_BACKEND", "sqlite").strip().lower() != "sqlite":
+        raise RuntimeError("cluster mode needs DB_BACKEND=sqlite (JSON journal has a single writer)")
+
+    workers = int(os.getenv("PROCESS_WORKERS", "0")) or os.cpu_count() or 2
+    sock_dir = os.getenv("CLUSTER_SOCKET_DIR", "").strip() or tempfile.mkdtemp(prefix="tvorcha-cluster-")
+    front = Front(workers, sock_dir, int(os.getenv("ADMIN_CHAT_ID", "-1000000000000")),
+                  dedup_size=int(os.getenv("UPDATE_DEDUP_SIZE", "10000")))
+    api_url = os.getenv("TELEGRAM_API_URL", "").strip()
+    bot = Bot(token, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url))) if api_url else Bot(token)
+
+    async def on_startup(app_):
+        # міграція з JSON — один раз тут, а не наввипередки в кожному воркері
+        store = SqliteStore(os.getenv("DB_SQLITE_PATH", "./game_db.sqlite3"),
+                            import_from=os.getenv("DB_FILE_PATH", "./game_db.json"))
+        store.load()
+        store.close()
+        await front.start()
+        base_url = os.getenv("RENDER_EXTERNAL_URL", "").strip() or "https://tvorcha-bot.onrender.com"
+        webhook_url = f"{base_url}/{token}"
+        fresh = await ensure_webhook(bot, webhook_url)
+        logging.info(f"✅ Webhook {'set' if fresh else 'already set'}: {webhook_url} | {workers} workers")
+
+    async def on_shutdown(app_):
+        # вебхук лишається: апдейти під час перезапуску чекають у Telegram
+        await front.stop()
+        await bot.session.close()
+
+    app = web.Application()
+    app.router.add_post(f"/{token}", front.handle_webhook)
+    app.router.add_get("/", lambda r: web.Response(text="ok"))
+    app.router.add_get("/stats", front.handle_stats)
+    app.router.add_get("/metrics", front.handle_metrics)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(build_app(), host="0.0.0.0", port=int(os.getenv("PORT", "10000")))
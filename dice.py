@@ -0,0 +1,39 @@
+# dice.py
+# Кубик, який можна перевірити.
+#
+# Кожен кидок гравця має номер n, а випадкові числа для нього — це
+# BLAKE2b(ключ = секрет сервера, "uid:n"), порізаний на рівномірні числа в
+# [0, 1). Нічого не залежить від інших гравців і порядку апдейтів, наперед
+# кидок не вгадати без секрету, а з секретом будь-який кидок із журналу можна
+# відтворити. Побудова — один виклик хешу, без Random() на кожен кидок.
+import hashlib
+from bisect import bisect_right
+
+DRAWS = 3               # чисел на кидок: грань, шанс артефакту, вибір артефакту
+BEAD_BIAS = 0.10        # Бісер Удачі: стільки ймовірності переходить з 1–2 на 5–6
+_SCALE = 2.0 ** -53
+
+
+def make_secret(value: str) -> bytes:
+    # ключ BLAKE2b — не довший за 64 байти
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=32).digest()
+
+
+def draws(secret: bytes, uid: str, n: int, k: int = DRAWS):
+    digest = hashlib.blake2b(f"{uid}:{n}".encode(), key=secret, digest_size=8 * k).digest()
+    return [(int.from_bytes(digest[i:i + 8], "big") >> 11) * _SCALE for i in range(0, 8 * k, 8)]
+
+
+def thresholds(bias: float = 0.0):
+    # межі граней на [0, 1): 1 і 2 втрачають bias/2 кожна, 5 і 6 — отримують
+    half = bias / 2
+    return (1 / 6 - half, 2 / 6 - bias, 3 / 6 - bias, 4 / 6 - bias, 5 / 6 - half)
+
+
+def face(u: float, bias: float = 0.0) -> int:
+    return bisect_right(thresholds(bias), u) + 1
+
+
+def probabilities(bias: float = 0.0):
+    bounds = (0.0,) + thresholds(bias) + (1.0,)
+    return [b - a for a, b in zip(bounds, bounds[1:])]
@@ -0,0 +1,157 @@
+# dispatch.py
+# Порядок обробки апдейтів: апдейти одного гравця — строго по черзі,
+# різних гравців — паралельно.
+import time
+import asyncio
+import logging
+import contextlib
+import collections
+
+
+class KeyedLocks:
+    """Окремий asyncio.Lock на кожен ключ (uid), живе лише поки ним хтось користується."""
+
+    def __init__(self):
+        self._locks = {}          # key -> [Lock, скільки задач тримають/чекають]
+        self.acquired = 0
+        self.contended = 0        # скільки разів довелося чекати
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def active(self) -> int:
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key):
+        if key is None:
+            yield 0.0
+            return
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            lock = entry[0]
+            if lock.locked():
+                self.contended += 1
+            t0 = time.perf_counter()
+            async with lock:
+                waited = time.perf_counter() - t0
+                self.acquired += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+                yield waited
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "wait_avg_ms": round(self.wait_total / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "active_keys": self.active,
+        }
+
+
+class RecentIds:
+    """Обмежена множина останніх update_id — Telegram інколи доставляє той самий апдейт вдруге."""
+
+    def __init__(self, size: int = 10000):
+        self.size = size
+        self._order = collections.deque()
+        self._seen = set()
+        self.duplicates = 0
+
+    def add(self, uid) -> bool:
+        # False, якщо такий id уже був
+        if uid in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(uid)
+        self._order.append(uid)
+        if len(self._order) > self.size:
+            self._seen.discard(self._order.popleft())
+        return True
+
+    def forget(self, uid):
+        # апдейт не прийнято (черга повна) — повторна доставка має пройти
+        self._seen.discard(uid)
+
+
+class WorkerPool:
+    """Обмежена черга + N задач-обробників.
+
+    submit() не чекає на обробку: вебхук одразу відповідає Telegram, а повна
+    черга — сигнал повернути 503, щоб Telegram повторив доставку пізніше.
+    """
+
+    def __init__(self, handler, workers: int = 8, maxsize: int = 1000, name: str = "worker"):
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.name = name
+        self.queue = None
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._tasks = []
+
+    def start(self):
+        self.queue = asyncio.Queue(self.maxsize)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._run(), name=f"{self.name}-{i}") for i in range(self.workers)]
+
+    def submit(self, item) -> bool:
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def _run(self):
+        while True:
+            item = await self.queue.get()
+            # між get() і handler() немає await — порядок черги зберігається до блокування гравця
+            self.busy += 1
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logging.exception(f"{self.name}: update failed")
+            finally:
+                self.busy -= 1
+                self.queue.task_done()
+
+    async def stop(self, timeout: float = 10.0):
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{self.name}: {self.depth} updates left in queue on shutdown")
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,154 @@
+# export.py
+# Вивантаження гравців для адмінів (/export): CSV або JSON.
+#
+# Рядки пишуться у файл по одному гравцю: з SQLite — злиттям розділів за uid
+# (кожен розділ читається сторінками у порядку uid на власному з'єднанні), тож
+# пам'ять не залежить від кількості гравців. Для JSON-сховища розділи живі і
+# змінюються в loop, тож loop сторінками серіалізує рядки гравців у JSON-текст
+# (так само, як їх віддає SQLite), а розбір і запис файлу — вже в потоці. Фільтри (глава, лише оплачені,
+# проміжок дат підтвердження оплати, гра) застосовуються на льоту. Розділи гравця
+# містять його активну гру — вона ж у колонці game.
+import csv
+import json
+from concurrent.futures import Future
+from datetime import date, datetime
+
+from storage import CachedSection
+
+SECTIONS = ("registrations", "stats", "progress", "inventory", "debts", "games")
+COLUMNS = ("uid", "name", "username", "game", "approved", "approved_at", "task", "chapter",
+           "reports", "stitches_total", "debt", "artifacts")
+
+
+def parse_filters(tokens):
+    """["json", "approved", "chapter=2", "game=x", "from=2026-01-01", "to=2026-01-31"] -> (формат, фільтри)."""
+    fmt, flt = "csv", {}
+    for tok in tokens:
+        key, _, val = tok.partition("=")
+        key = key.lower()           # значення — як є: коди ігор чутливі до регістру
+        if key in ("csv", "json") and not val:
+            fmt = key
+        elif key == "approved" and not val:
+            flt["approved"] = True
+        elif key == "chapter" and val.isdigit():
+            flt["chapter"] = int(val)
+        elif key == "game" and val:
+            flt["game"] = val
+        elif key in ("from", "to") and val:
+            flt[key] = date.fromisoformat(val)      # ValueError — показуємо формат адміну
+        else:
+            raise ValueError(tok)
+    if "from" in flt or "to" in flt:
+        flt["approved"] = True
+    return fmt, flt
+
+
+# ---------- джерела: (uid, {розділ: значення | None}) за зростанням uid ----------
+def sqlite_rows(store, names=SECTIONS, batch: int = 2000):
+    for uid, raw in store.iter_joined(names, batch):
+        yield uid, {name: json.loads(r) if r is not None else None for name, r in raw.items()}
+
+
+def _raw(section, uid: str):
+    # JSON-текст значення або None; CachedSection — повз кеш, щоб вивантаження його не роздувало
+    val = section.peek(uid) if isinstance(section, CachedSection) else section.get(uid)
+    return None if val is None else json.dumps(val, ensure_ascii=False)
+
+
+def dump_page(db, keys, names=SECTIONS):
+    return [(uid, {name: _raw(db[name], uid) for name in names}) for uid in keys]
+
+
+def _on_loop(loop, fn, *args):
+    # виклик fn у потоці loop і очікування результату з потоку вивантаження
+    fut = Future()
+
+    def run():
+        try:
+            fut.set_result(fn(*args))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    loop.call_soon_threadsafe(run)
+    return fut.result()
+
+
+def dict_rows(db, keys, loop=None, names=SECTIONS, page: int = 200):
+    # keys — знімок uid, узятий у потоці loop; loop=None — db належить поточному потоку
+    for i in range(0, len(keys), page):
+        chunk = keys[i:i + page]
+        rows = dump_page(db, chunk, names) if loop is None else _on_loop(loop, dump_page, db, chunk, names)
+        for uid, raw in rows:
+            yield uid, {name: json.loads(r) if r is not None else None for name, r in raw.items()}
+
+
+def player_keys(db):
+    return sorted(set(db["stats"]) | set(db["registrations"]), key=int)
+
+
+# ---------- рядок ----------
+def _approved_day(reg):
+    try:
+        return datetime.fromisoformat(reg["approved_at"]).date()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def player_row(uid: str, rows: dict, chapter_of, flt: dict, default_game: str = ""):
+    # dict рядка або None, якщо гравець не проходить фільтр; chapter_of(current, game)
+    game = (rows.get("games") or {}).get("active") or default_game
+    if "game" in flt and game != flt["game"]:
+        return None
+    reg = rows["registrations"] or {}
+    approved = bool(reg.get("approved"))
+    if flt.get("approved") and not approved:
+        return None
+    if "from" in flt or "to" in flt:
+        day = _approved_day(reg)
+        if day is None or day < flt.get("from", date.min) or day > flt.get("to", date.max):
+            return None
+    current = (rows["progress"] or {}).get("current", 1)
+    chapter = chapter_of(current, game)
+    if "chapter" in flt and chapter != flt["chapter"]:
+        return None
+    stats = rows["stats"] or {}
+    return {
+        "uid": int(uid),
+        "name": stats.get("name"),
+        "username": stats.get("username"),
+        "game": game,
+        "approved": approved,
+        "approved_at": reg.get("approved_at"),
+        "task": current,
+        "chapter": chapter,
+        "reports": stats.get("reports", 0),
+        "stitches_total": stats.get("stitches_total", 0),
+        "debt": rows["debts"] or 0,
+        "artifacts": rows["inventory"] or {},
+    }
+
+
+def write_export(rows, path: str, fmt: str, flt: dict, chapter_of, default_game: str = "") -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "json":
+            f.write("[")
+            for uid, sections in rows:
+                row = player_row(uid, sections, chapter_of, flt, default_game)
+                if row is not None:
+                    f.write(",\n" if count else "\n")
+                    f.write(json.dumps(row, ensure_ascii=False))
+                    count += 1
+            f.write("\n]\n")
+            return count
+        # BOM — щоб Excel відкрив кирилицю без танців
+        f.write("\ufeff")
+        out = csv.writer(f)
+        out.writerow(COLUMNS)
+        for uid, sections in rows:
+            row = player_row(uid, sections, chapter_of, flt, default_game)
+            if row is not None:
+                row["artifacts"] = ";".join(f"{code}:{n}" for code, n in row["artifacts"].items())
+                out.writerow([row[c] for c in COLUMNS])
+                count += 1
+    return count
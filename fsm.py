@@ -0,0 +1,157 @@
+# fsm.py
+# Сховище станів aiogram (FSM), що переживає перезапуск.
+#
+# Стан і дані кожного ключа — рядок у таблиці SQLite. Читання йдуть через
+# LRU-кеш у пам'яті (промах — один запит у потоці запису, loop не блокується),
+# записи лише позначаються і скидаються пачкою тим самим AsyncWriter, що й
+# основна БД, тож зміна стану не додає диск до кожного повідомлення.
+import os
+import json
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey
+
+from storage import AsyncWriter
+
+_EMPTY = "{}"
+
+
+class FsmStore:
+    """Store-інтерфейс для AsyncWriter: ключ -> [стан, дані як JSON]."""
+
+    def __init__(self, path: str, cache_size: int = 5000):
+        self.path = path
+        self.cache_size = cache_size
+        self.bytes_written = 0
+        self.db = {}                  # розділів гравців тут немає (AsyncWriter.prefetch їх пропускає)
+        self.cache = OrderedDict()
+        self._dirty = {}
+        self._conn = None
+
+    def load(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS fsm (key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL)")
+        return self.db
+
+    # ---------- читання ----------
+    def read(self, key: str):
+        # викликається з потоку запису — бачить усе, що вже записано
+        rows = self._conn.execute("SELECT state, data FROM fsm WHERE key = ?", (key,)).fetchall()
+        return list(rows[0]) if rows else [None, _EMPTY]
+
+    def cached(self, key: str):
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: list):
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+
+    # ---------- запис ----------
+    def mark(self, key: str):
+        self._dirty[key] = None
+
+    def collect(self):
+        excess = len(self.cache) - self.cache_size
+        if excess > 0:
+            victims = [k for k in self.cache if k not in self._dirty][:excess]
+            for k in victims:
+                del self.cache[k]
+        if not self._dirty:
+            return None
+        dirty, self._dirty = self._dirty, {}
+        ops = []
+        for key in dirty:
+            entry = self.cache.get(key)
+            if entry is not None:
+                ops.append((key, entry[0], entry[1]))
+        return len(ops), ops
+
+    def write(self, batch) -> int:
+        _, ops = batch
+        written = 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, state, data in ops:
+                if state is None and data == _EMPTY:
+                    self._conn.execute("DELETE FROM fsm WHERE key = ?", (key,))
+                else:
+                    self._conn.execute("INSERT OR REPLACE INTO fsm (key, state, data) VALUES (?, ?, ?)",
+                                       (key, state, data))
+                    written += len(data)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.bytes_written += written
+        return written
+
+    def need_compact(self) -> bool:
+        return False
+
+    def flush(self) -> int:
+        batch = self.collect()
+        return 0 if batch is None else self.write(batch)
+
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+
+class PersistentStorage(BaseStorage):
+    """aiogram-сховище поверх FsmStore; замінює MemoryStorage без змін у хендлерах."""
+
+    def __init__(self, path: str, cache_size: int = 5000):
+        self.store = FsmStore(path, cache_size)
+        self.writer = AsyncWriter(self.store)
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.store.load()
+
+    def start(self):
+        self.writer.start()
+
+    async def _entry(self, key: StorageKey) -> list:
+        skey = self.key_builder.build(key)
+        entry = self.store.cached(skey)
+        if entry is None:
+            entry = await self.writer.read(self.store.read, skey)
+            # поки читали, інший обробник міг уже записати цей ключ
+            entry = self.store.cached(skey) or entry
+            self.store.put(skey, entry)
+        return entry
+
+    def _changed(self, key: StorageKey, entry: list):
+        skey = self.key_builder.build(key)
+        self.store.put(skey, entry)
+        self.store.mark(skey)
+        self.writer.request_flush()
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        entry = await self._entry(key)
+        state = state.state if isinstance(state, State) else state
+        self._changed(key, [state, entry[1]])
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = await self._entry(key)
+        # серіалізуємо одразу: несеріалізовані дані — помилка в хендлері, а не тиха втрата при записі
+        self._changed(key, [entry[0], json.dumps(data, ensure_ascii=False, separators=(",", ":"))])
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return json.loads((await self._entry(key))[1])
+
+    async def close(self) -> None:
+        await self.writer.close()
@@ -0,0 +1,151 @@
+# games.py
+# Кілька ігор (сезонів) з одного розгортання.
+#
+# Перелік ігор — JSON: {"default": "tayemnyci", "games": [{"code", "name", "quests"}]}.
+# Каталог основної гри завантажується на старті і живе весь час (за його файлом
+# стежить CatalogWatcher); решта компілюються при першому зверненні гравця і
+# тримаються в невеликому LRU — сезон, у який ніхто не грає, не займає пам'ять.
+# Звичайні розділи БД завжди містять стан активної гри гравця, а стан інших
+# ігор лежить у розділі "games", тож обробники лишаються такими ж, як для
+# однієї гри, а гарячий шлях додає лише один пошук активної гри.
+import json
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from catalog import load_catalog
+
+
+class Game:
+    __slots__ = ("code", "name", "quests")
+
+    def __init__(self, code: str, name: str, quests: str):
+        self.code = code
+        self.name = name
+        self.quests = quests
+
+
+def load_games(path: str, default: Game):
+    # -> (ігри за кодом, код основної); без файлу — одна гра, як до появи реєстру
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {default.code: default}, default.code
+    games = {}
+    for g in data.get("games", []):
+        if "code" not in g or "quests" not in g:
+            raise ValueError(f"game {g}: потрібні code і quests")
+        code = g["code"]
+        # код іде в callback_data "game|<код>": число там сприймається як uid гравця
+        if not code or "|" in code or code.isdigit() or len(code.encode()) > 32:
+            raise ValueError(f"game {code!r}: код — до 32 байтів, не число і без '|'")
+        games[code] = Game(code, g.get("name") or code, g["quests"])
+    if not games:
+        raise ValueError("games: порожній список")
+    main = data.get("default") or next(iter(games))
+    if main not in games:
+        raise ValueError(f"default: немає гри {main}")
+    return games, main
+
+
+class GameRegistry:
+    """Ігри і їхні скомпільовані каталоги.
+
+    Основна гра — окреме поле без блокування і LRU: для неї catalog() коштує
+    одне порівняння. Інші каталоги вантажить ensure() у потоці (одночасні
+    звернення до ще не завантаженої гри чекають одну й ту саму компіляцію);
+    catalog() у потоці loop лише бере готовий каталог з кешу.
+    """
+
+    def __init__(self, games: dict, default: str, cache_size: int = 4, fallback: dict = None):
+        self.games = games
+        self.default = default
+        self.cache_size = max(1, cache_size)
+        self.fallback = fallback        # лише для основної гри — щоб бот стартував і без файлу квестів
+        self.main = None
+        self.loads = 0
+        self._cache = OrderedDict()     # код -> Catalog, найсвіжіше звернення — в кінці
+        self._pending = {}              # код -> Future завантаження
+        self._lock = threading.Lock()   # /export читає каталоги з потоку
+
+    def __contains__(self, code) -> bool:
+        return code in self.games
+
+    def name(self, code: str) -> str:
+        g = self.games.get(code)
+        return g.name if g is not None else code
+
+    # ---------- завантаження ----------
+    def _load(self, code: str):
+        g = self.games[code]
+        cat = load_catalog(g.quests, self.fallback if code == self.default else None)
+        self.loads += 1
+        logging.info(f"📚 game {code}: {cat.label}, {len(cat)} tasks")
+        return cat
+
+    def load_main(self):
+        self.main = self._load(self.default)
+        return self.main
+
+    def _put(self, code: str, cat):
+        with self._lock:
+            self._cache[code] = cat
+            self._cache.move_to_end(code)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return cat
+
+    # ---------- доступ ----------
+    def cached(self, code: str):
+        if code == self.default:
+            return self.main
+        with self._lock:
+            cat = self._cache.get(code)
+            if cat is not None:
+                self._cache.move_to_end(code)
+        return cat
+
+    def catalog(self, code: str):
+        if code == self.default:
+            return self.main
+        cat = self.cached(code)
+        if cat is None:
+            # апдейт гравця проходить через ensure() у middleware, тож сюди потрапляють
+            # лише рідкісні шляхи (нагадування, експорт) — компілюємо на місці
+            cat = self._put(code, self._load(code))
+        return cat
+
+    async def ensure(self, code: str):
+        cat = self.cached(code)
+        if cat is not None:
+            return cat
+        fut = self._pending.get(code)
+        if fut is None:
+            fut = self._pending[code] = asyncio.get_running_loop().run_in_executor(None, self._load, code)
+        try:
+            cat = await asyncio.shield(fut)
+        finally:
+            if self._pending.get(code) is fut and fut.done():
+                del self._pending[code]
+        return self._put(code, cat)
+
+    def clear(self):
+        # /catalog reload: інші ігри перечитаються з файлів при наступному зверненні
+        with self._lock:
+            self._cache.clear()
+
+    def text(self) -> str:
+        with self._lock:
+            cached = list(self._cache)
+        lines = []
+        for code, g in self.games.items():
+            if code == self.default:
+                state = "основна"
+            elif code in cached:
+                state = "у пам'яті"
+            else:
+                state = "не завантажена"
+            lines.append(f"• {code} — {g.name} ({state})")
+        return "\n".join(lines)
@@ -0,0 +1,189 @@
+# leaderboard.py
+# Рейтинги гравців, що оновлюються точково, а не пересортуванням усіх гравців.
+#
+# Кожен рейтинг — відсортований список ключів (bisect): зміна одного гравця —
+# пошук O(log n) + зсув списку, топ-k — зріз O(k). Загальний рейтинг — за
+# сумою стібків, рейтинг глави — серед тих, хто зараз у ній, за просуванням,
+# потім за стібками. Готовий текст топу кешується і скидається лише тоді,
+# коли зміна зачепила перші top_n місць.
+from bisect import bisect_left, insort
+
+from storage import CachedSection
+
+
+class Ranking:
+    def __init__(self):
+        self._order = []    # відсортовані ключі (менший — вище), останній елемент — uid
+        self._key = {}      # uid -> поточний ключ
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, uid):
+        return uid in self._key
+
+    def load(self, items):
+        # масове наповнення одним сортуванням замість n вставок
+        self._key = {uid: key + (uid,) for uid, key in items}
+        self._order = sorted(self._key.values())
+
+    def set(self, uid, key) -> int:
+        # повертає найвище зачеплене місце (0-based) — для інвалідації кешу
+        key = key + (uid,)
+        old = self._key.get(uid)
+        if old == key:
+            return len(self._order)
+        touched = len(self._order)
+        if old is not None:
+            i = bisect_left(self._order, old)
+            del self._order[i]
+            touched = i
+        self._key[uid] = key
+        insort(self._order, key)
+        return min(touched, bisect_left(self._order, key))
+
+    def remove(self, uid) -> int:
+        old = self._key.pop(uid, None)
+        if old is None:
+            return len(self._order)
+        i = bisect_left(self._order, old)
+        del self._order[i]
+        return i
+
+    def top(self, k: int):
+        return [key[-1] for key in self._order[:k]]
+
+    def rank(self, uid):
+        # 1-based місце або None
+        key = self._key.get(uid)
+        return None if key is None else bisect_left(self._order, key) + 1
+
+
+class Leaderboard:
+    """Загальний рейтинг + рейтинг кожної глави.
+
+    chapter_of(current) -> номер глави для номера поточного завдання гравця.
+    Тримає власну мінімальну копію полів (стібки, прогрес, ім'я), тож
+    перебудова глав після зміни каталогу не читає сховище.
+    """
+
+    def __init__(self, chapter_of, top_n: int = 10):
+        self.chapter_of = chapter_of
+        self.top_n = top_n
+        self.overall = Ranking()
+        self.chapters = {}      # номер глави -> Ranking
+        self.players = {}       # uid -> [stitches, current, name, chapter]
+        self._text = {}         # None | глава -> готовий текст топу
+
+    def __len__(self):
+        return len(self.players)
+
+    # ---------- наповнення ----------
+    def build(self, stats, progress):
+        # одноразово при старті; далі — лише update()
+        stats = stats.export() if isinstance(stats, CachedSection) else stats
+        progress = progress.export() if isinstance(progress, CachedSection) else progress
+        for uid in set(stats) | set(progress):
+            s, pr = stats.get(uid), progress.get(uid)
+            self.players[uid] = [
+                _int(s.get("stitches_total")) if s else 0,
+                _int(pr.get("current"), 1) if pr else 1,
+                _display_name(s, uid) if s else f"ID {uid}",
+                None,
+            ]
+        self.overall.load((uid, (-p[0],)) for uid, p in self.players.items())
+        self.set_chapters(self.chapter_of)
+
+    def update(self, uid: str, stats: dict = None, progress: dict = None):
+        p = self.players.get(uid)
+        if p is None:
+            p = self.players[uid] = [0, 1, f"ID {uid}", None]
+            if stats is None:
+                self._touch(None, self.overall.set(uid, (0,)))
+        if stats is not None:
+            p[0] = _int(stats.get("stitches_total"))
+            p[2] = _display_name(stats, uid)
+            self._touch(None, self.overall.set(uid, (-p[0],)))
+        if progress is not None:
+            p[1] = _int(progress.get("current"), 1)
+        if stats is not None or progress is not None:
+            self._place(uid, p)
+
+    def remove(self, uid: str):
+        p = self.players.pop(uid, None)
+        if p is None:
+            return
+        self._touch(None, self.overall.remove(uid))
+        if p[3] is not None:
+            self._touch(p[3], self.chapters[p[3]].remove(uid))
+
+    def set_chapters(self, chapter_of):
+        # новий каталог може перекроїти межі глав — розкладаємо гравців заново
+        self.chapter_of = chapter_of
+        groups = {}
+        for uid, p in self.players.items():
+            p[3] = chapter_of(p[1])
+            if p[3] is not None:
+                groups.setdefault(p[3], []).append((uid, (-p[1], -p[0])))
+        self.chapters = {}
+        for chapter, items in groups.items():
+            board = self.chapters[chapter] = Ranking()
+            board.load(items)
+        self._text.clear()
+
+    def _place(self, uid, p):
+        chapter = self.chapter_of(p[1])
+        if p[3] is not None and p[3] != chapter:
+            self._touch(p[3], self.chapters[p[3]].remove(uid))
+        p[3] = chapter
+        if chapter is None:
+            return
+        board = self.chapters.get(chapter)
+        if board is None:
+            board = self.chapters[chapter] = Ranking()
+        self._touch(chapter, board.set(uid, (-p[1], -p[0])))
+
+    def _touch(self, chapter, place: int):
+        if place < self.top_n:
+            self._text.pop(chapter, None)
+
+    # ---------- запити ----------
+    def top(self, chapter=None, k: int = None):
+        # [(місце, uid, ім'я, стібки, поточне завдання)]
+        board = self.overall if chapter is None else self.chapters.get(chapter)
+        if board is None:
+            return []
+        out = []
+        for place, uid in enumerate(board.top(k or self.top_n), 1):
+            stitches, current, name, _ = self.players[uid]
+            out.append((place, uid, name, stitches, current))
+        return out
+
+    def rank(self, uid: str, chapter=None):
+        board = self.overall if chapter is None else self.chapters.get(chapter)
+        return board.rank(uid) if board is not None else None
+
+    def chapter_of_player(self, uid: str):
+        p = self.players.get(uid)
+        return p[3] if p else None
+
+    def chapter_counts(self) -> dict:
+        return {c: len(board) for c, board in self.chapters.items() if len(board)}
+
+    def text(self, chapter, render) -> str:
+        # render(top) викликається лише після зміни топу цієї дошки
+        cached = self._text.get(chapter)
+        if cached is None:
+            cached = self._text[chapter] = render(self.top(chapter))
+        return cached
+
+
+def _int(value, default: int = 0) -> int:
+    return value if type(value) is int else default
+
+
+def _display_name(stats: dict, uid: str) -> str:
+    name = stats.get("name") or ""
+    if not name and stats.get("username"):
+        name = "@" + stats["username"]
+    return name or f"ID {uid}"
@@ -0,0 +1,167 @@
+# metrics.py
+# Мінімальні метрики у форматі Prometheus (text exposition 0.0.4) без зовнішніх залежностей.
+import math
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _num(v) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry, name: str, doc: str, labels=()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()   # інколи пишемо з потоку запису БД
+        registry.register(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, registry, name, doc, labels=()):
+        super().__init__(registry, name, doc, labels)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        for key, val in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_num(val)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Значення читається в момент запиту /metrics через fn() -> число або {labels: число}."""
+    kind = "gauge"
+
+    def __init__(self, registry, name, doc, fn, labels=()):
+        super().__init__(registry, name, doc, labels)
+        self.fn = fn
+
+    def render(self):
+        lines = self.header()
+        val = self.fn()
+        if isinstance(val, dict):
+            for key, v in sorted(val.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key if isinstance(key, tuple) else (key,))} {_num(v)}")
+        else:
+            lines.append(f"{self.name} {_num(val)}")
+        return lines
+
+
+class CounterFunc(Gauge):
+    """Лічильник, який веде сам компонент (pool.rejected тощо): значення — fn() на момент запиту."""
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, doc, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, doc, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series = {}    # labels -> [counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+                    break
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self):
+        lines = self.header()
+        for key, s in sorted(self._series.items()):
+            acc = 0
+            for bound, n in zip(self.buckets, s):
+                acc += n
+                lbl = _labels(self.label_names + ("le",), key + (_num(bound),))
+                lines.append(f"{self.name}_bucket{lbl} {acc}")
+            lbl = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{lbl} {_num(s[-2])}")
+            lines.append(f"{self.name}_count{lbl} {s[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def counter(self, name, doc, labels=()):
+        return Counter(self, name, doc, labels)
+
+    def gauge(self, name, doc, fn, labels=()):
+        return Gauge(self, name, doc, fn, labels)
+
+    def counter_fn(self, name, doc, fn, labels=()):
+        return CounterFunc(self, name, doc, fn, labels)
+
+    def histogram(self, name, doc, labels=(), buckets=DEFAULT_BUCKETS):
+        return Histogram(self, name, doc, labels, buckets)
+
+    def render(self) -> str:
+        lines = []
+        for m in self.metrics:
+            try:
+                lines.extend(m.render())
+            except Exception as e:
+                lines.append(f"# {m.name}: {type(e).__name__}")
+        return "\n".join(lines) + "\n"
+
+
+def _with_label(sample: str, name: str, value) -> str:
+    head, _, val = sample.rpartition(" ")
+    label = f'{name}="{_escape(value)}"'
+    head = head[:-1] + "," + label + "}" if head.endswith("}") else head + "{" + label + "}"
+    return f"{head} {val}"
+
+
+def merge(parts, label: str = "process") -> str:
+    """[(значення мітки, текст /metrics процесу)] -> один текст; кожна родина метрик — одним блоком."""
+    families = {}   # ім'я -> (HELP/TYPE, зразки)
+    for value, text in parts:
+        fam = None
+        for line in text.splitlines():
+            if line.startswith(("# HELP ", "# TYPE ")):
+                fam = families.setdefault(line.split(" ", 3)[2], ([], []))
+                if line not in fam[0]:
+                    fam[0].append(line)
+            elif line and not line.startswith("#") and fam is not None:
+                fam[1].append(_with_label(line, label, value))
+    lines = []
+    for head, samples in families.values():
+        lines.extend(head)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
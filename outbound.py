@@ -0,0 +1,195 @@
+# outbound.py
+# Черга вихідних повідомлень до Bot API з обмеженням швидкості.
+#
+# Telegram дозволяє ~30 повідомлень/с загалом, ~1/с в один приватний чат і ~20/хв
+# в одну групу. Кожен чат має власну "смугу" з пріоритетною чергою, тож повільна
+# адмін-група не затримує відповіді гравцям, а оплати в ній ідуть раніше за звіти.
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNetworkError,
+    TelegramServerError,
+)
+
+PRIO_PAYMENT = 0   # скриншоти оплати
+PRIO_ACTION  = 1   # відповіді гравцям на рішення адміна
+PRIO_REPORT  = 2   # фото-звіти
+PRIO_BULK    = 9   # масові розсилки
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate              # токенів за секунду
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self) -> float:
+        # скільки чекати до наступного токена (0 — можна зараз)
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def take(self):
+        while True:
+            wait = self.delay()
+            if wait <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        # після 429: обнуляємо запас і зсуваємо поповнення на retry_after
+        self.tokens = 0
+        self.stamp = time.monotonic() + seconds
+
+    def full(self) -> bool:
+        # запас відновився — такий бак нічим не відрізняється від нового
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class _Lane:
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.heap = []
+        self.task = None
+
+
+class Outbound:
+    PRUNE_EVERY = 60.0   # с; як часто прибирати баки чатів, що вже відновили запас
+
+    def __init__(self, bot, global_rate: float = 30, private_rate: float = 1, group_per_minute: float = 20,
+                 max_attempts: int = 5):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.private_rate = private_rate
+        self.group_per_minute = group_per_minute
+        self.max_attempts = max_attempts
+        self._lanes = {}
+        # баки живуть довше за смуги: порожня черга не скидає ліміт чату
+        self._buckets = {}
+        self._prune_at = time.monotonic() + self.PRUNE_EVERY
+        self._seq = itertools.count()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.flood_until = 0.0   # monotonic: до цього моменту масові розсилки чекають
+
+    def _bucket_for(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                # групи: невеликий запас на сплеск, далі group_per_minute
+                bucket = TokenBucket(self.group_per_minute / 60, 3)
+            else:
+                bucket = TokenBucket(self.private_rate, 1)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self):
+        # бак без смуги, що поповнився до повного, можна забути — новий буде таким самим
+        self._prune_at = time.monotonic() + self.PRUNE_EVERY
+        for chat_id in [c for c, b in self._buckets.items() if c not in self._lanes and b.full()]:
+            del self._buckets[chat_id]
+
+    def call(self, chat_id: int, factory, priority: int = PRIO_ACTION) -> asyncio.Future:
+        """Ставить виклик factory() (корутина Bot API) у чергу чату; повертає Future з результатом."""
+        if time.monotonic() >= self._prune_at:
+            self._prune()
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = _Lane(self._bucket_for(chat_id))
+        fut = asyncio.get_running_loop().create_future()
+        # помилку вже залоговано; без цього "fire-and-forget" виклики сиплять попередженнями
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        heapq.heappush(lane.heap, (priority, next(self._seq), factory, fut, 1))
+        if lane.task is None or lane.task.done():
+            lane.task = asyncio.get_running_loop().create_task(self._drain(chat_id, lane), name=f"outbound-{chat_id}")
+        return fut
+
+    def send_message(self, chat_id: int, text: str, priority: int = PRIO_ACTION, **kwargs):
+        return self.call(chat_id, lambda: self.bot.send_message(chat_id, text, **kwargs), priority)
+
+    def send_photo(self, chat_id: int, photo: str, priority: int = PRIO_REPORT, **kwargs):
+        return self.call(chat_id, lambda: self.bot.send_photo(chat_id, photo, **kwargs), priority)
+
+    def send_media_group(self, chat_id: int, media: list, priority: int = PRIO_REPORT, **kwargs):
+        return self.call(chat_id, lambda: self.bot.send_media_group(chat_id, media, **kwargs), priority)
+
+    async def _drain(self, chat_id: int, lane: _Lane):
+        while lane.heap:
+            priority, seq, factory, fut, attempt = heapq.heappop(lane.heap)
+            if fut.cancelled():
+                continue
+            await lane.bucket.take()
+            await self.global_bucket.take()
+            try:
+                result = await factory()
+            except TelegramRetryAfter as e:
+                self.retried += 1
+                logging.warning(f"outbound {chat_id}: 429, retry after {e.retry_after}s")
+                lane.bucket.pause(e.retry_after)
+                self.flood_until = max(self.flood_until, time.monotonic() + e.retry_after)
+                self._retry(lane, priority, seq, factory, fut, attempt, e)
+                continue
+            except (TelegramNetworkError, TelegramServerError) as e:
+                self.retried += 1
+                lane.bucket.pause(min(2 ** attempt, 30))
+                self._retry(lane, priority, seq, factory, fut, attempt, e)
+                continue
+            except Exception as e:
+                if not isinstance(e, (TelegramForbiddenError, TelegramBadRequest)):
+                    logging.exception(f"outbound {chat_id}: send failed")
+                self.failed += 1
+                if not fut.done():
+                    fut.set_exception(e)
+                continue
+            self.sent += 1
+            if not fut.done():
+                fut.set_result(result)
+        # смуга порожня — прибираємо чергу і задачу; бак чату лишається в self._buckets
+        if self._lanes.get(chat_id) is lane and not lane.heap:
+            del self._lanes[chat_id]
+
+    def _retry(self, lane, priority, seq, factory, fut, attempt, exc):
+        if attempt >= self.max_attempts:
+            self.failed += 1
+            if not fut.done():
+                fut.set_exception(exc)
+            return
+        # той самий seq — повідомлення не переганяють одне одного
+        heapq.heappush(lane.heap, (priority, seq, factory, fut, attempt + 1))
+
+    @property
+    def depth(self) -> int:
+        return sum(len(lane.heap) for lane in self._lanes.values())
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.depth,
+            "lanes": len(self._lanes),
+            "buckets": len(self._buckets),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def close(self, timeout: float = 10.0):
+        tasks = [lane.task for lane in self._lanes.values() if lane.task and not lane.task.done()]
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for t in pending:
+            t.cancel()
@@ -0,0 +1,220 @@
+# players.py
+# Компактне представлення гравців у пам'яті.
+#
+# Замість чотирьох вкладених dict на гравця (stats / progress / inventory / debts)
+# тримаємо один запис зі __slots__: цілі поля, артефакти — масив лічильників за
+# індексом коду, історія — обмежене кільце. Перетворення в/з поточного JSON-формату
+# без втрат (крім історії, довшої за HISTORY_LIMIT).
+from array import array
+from collections import deque
+
+from storage import CachedSection, _MISSING
+
+HISTORY_LIMIT = 50
+
+PLAYER_SECTIONS = ("stats", "progress", "inventory", "debts")
+_BIT = {name: 1 << i for i, name in enumerate(PLAYER_SECTIONS)}
+
+# відсутнє поле (на відміну від None, яке теж буває значенням, напр. username)
+_ABSENT = object()
+
+# спільний реєстр кодів артефактів: індекс у масиві інвентаря
+_codes = []
+_code_index = {}
+
+
+def artifact_slot(code: str) -> int:
+    i = _code_index.get(code)
+    if i is None:
+        i = _code_index[code] = len(_codes)
+        _codes.append(code)
+    return i
+
+
+def register_artifacts(codes):
+    # коди з каталогу займають перші комірки — у типового гравця масив короткий
+    for code in codes:
+        artifact_slot(code)
+
+
+class Player:
+    __slots__ = ("flags", "name", "username", "reports", "stitches_total",
+                 "current", "history", "inv", "debt", "extra")
+
+    def __init__(self):
+        self.flags = 0
+        self.name = self.username = _ABSENT
+        self.reports = self.stitches_total = self.current = _ABSENT
+        self.history = None     # None — порожня історія, _ABSENT — ключа немає взагалі
+        self.inv = None
+        self.debt = 0
+        self.extra = None       # {розділ: {незвичні ключі}} — рідко, тому None за замовчуванням
+
+    def _extra(self, section: str) -> dict:
+        if self.extra is None:
+            self.extra = {}
+        return self.extra.setdefault(section, {})
+
+    # ---------- JSON -> запис ----------
+    def load(self, section: str, value):
+        if self.extra is not None:
+            self.extra.pop(section, None)
+        if value is _MISSING:
+            self.flags &= ~_BIT[section]
+            return
+        self.flags |= _BIT[section]
+
+        if section == "debts":
+            if type(value) is int:
+                self.debt = value
+            else:
+                self.debt = 0
+                self._extra("debts")["value"] = value
+        elif section == "stats":
+            value = dict(value)
+            self.name = value.pop("name", _ABSENT)
+            self.username = value.pop("username", _ABSENT)
+            self.reports = _pop_int(value, "reports")
+            self.stitches_total = _pop_int(value, "stitches_total")
+            if value:
+                self._extra("stats").update(value)
+        elif section == "progress":
+            value = dict(value)
+            self.current = _pop_int(value, "current")
+            hist = value.pop("history", _ABSENT)
+            if isinstance(hist, list):
+                self.history = deque(hist, maxlen=HISTORY_LIMIT) if hist else None
+            else:
+                self.history = _ABSENT
+                if hist is not _ABSENT:
+                    value["history"] = hist
+            if value:
+                self._extra("progress").update(value)
+        elif section == "inventory":
+            self.inv = None
+            odd = {}
+            for code, count in value.items():
+                if type(count) is int and 0 < count < 2 ** 32:
+                    i = artifact_slot(code)
+                    if self.inv is None or len(self.inv) <= i:
+                        grown = array("I", bytes(4 * (i + 1)))
+                        if self.inv is not None:
+                            grown[:len(self.inv)] = self.inv
+                        self.inv = grown
+                    self.inv[i] = count
+                else:
+                    odd[code] = count
+            if odd:
+                self._extra("inventory").update(odd)
+
+    # ---------- запис -> JSON ----------
+    def dump(self, section: str):
+        if not self.flags & _BIT[section]:
+            return _MISSING
+        extra = self.extra.get(section) if self.extra else None
+
+        if section == "debts":
+            return extra["value"] if extra else self.debt
+        if section == "stats":
+            out = {}
+            for key in ("name", "username", "reports", "stitches_total"):
+                val = getattr(self, key)
+                if val is not _ABSENT:
+                    out[key] = val
+            if extra:
+                out.update(extra)
+            return out
+        if section == "progress":
+            out = {}
+            if self.current is not _ABSENT:
+                out["current"] = self.current
+            if self.history is not _ABSENT:
+                out["history"] = list(self.history) if self.history else []
+            if extra:
+                out.update(extra)
+            return out
+        if section == "inventory":
+            out = {}
+            if self.inv is not None:
+                for i, count in enumerate(self.inv):
+                    if count:
+                        out[_codes[i]] = count
+            if extra:
+                out.update(extra)
+            return out
+
+
+def _pop_int(d: dict, key: str):
+    val = d.get(key, _ABSENT)
+    if type(val) is int:
+        del d[key]
+        return val
+    # нецілі значення лишаються в d і потраплять у extra
+    return _ABSENT
+
+
+class PlayerTable:
+    """uid (int) -> Player."""
+
+    def __init__(self):
+        self.players = {}
+
+    def __len__(self):
+        return len(self.players)
+
+    def get(self, uid: int):
+        return self.players.get(uid)
+
+    def dump(self, uid: int, section: str):
+        p = self.players.get(uid)
+        return _MISSING if p is None else p.dump(section)
+
+    def load(self, uid: int, section: str, value):
+        p = self.players.get(uid)
+        if p is None:
+            if value is _MISSING:
+                return
+            p = self.players[uid] = Player()
+        p.load(section, value)
+        if not p.flags:
+            del self.players[uid]
+
+    def keys(self, section: str):
+        bit = _BIT[section]
+        return (uid for uid, p in self.players.items() if p.flags & bit)
+
+    @classmethod
+    def from_db(cls, db: dict) -> "PlayerTable":
+        table = cls()
+        for section in PLAYER_SECTIONS:
+            for key, value in db.get(section, {}).items():
+                table.load(int(key), section, value)
+        return table
+
+    def to_db(self) -> dict:
+        return {
+            section: {str(uid): self.players[uid].dump(section) for uid in self.keys(section)}
+            for section in PLAYER_SECTIONS
+        }
+
+
+class PlayerView(CachedSection):
+    # один із розділів stats/progress/inventory/debts поверх PlayerTable
+    def __init__(self, table: PlayerTable, name: str):
+        super().__init__(name)
+        self.table = table
+
+    def _load(self, key):
+        return self.table.dump(int(key), self.name)
+
+    def _keys(self):
+        return (str(uid) for uid in self.table.keys(self.name))
+
+    def commit(self, key, value):
+        self.table.load(int(key), self.name, value)
+
+
+def compact_views(db: dict) -> dict:
+    # для JournalStore(views=...): замінює чотири розділи гравців на компактну таблицю
+    table = PlayerTable.from_db(db)
+    return {section: PlayerView(table, section) for section in PLAYER_SECTIONS}
@@ -0,0 +1,147 @@
+# reminders.py
+# Нагадування гравцям: про борг стібків і про довгу паузу без звітів.
+#
+# Кандидатів не шукаємо перебором усіх гравців: боржники — множина, яку
+# оновлює кожна зміна db["debts"], а час останньої активності (звіт або
+# реєстрація) тримається відсортованим. Раз на перевірку беремо лише тих, чия
+# пауза щойно перетнула поріг: [попередня перевірка − idle, зараз − idle) —
+# кожна пауза дає одне нагадування, без окремого "вже нагадали" на диску.
+# Відправка — пачками через Outbound з низьким пріоритетом і власним темпом.
+import time
+import asyncio
+import itertools
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from aiogram.exceptions import TelegramForbiddenError
+
+from outbound import TokenBucket, PRIO_BULK
+from storage import CachedSection
+
+
+def _stamp(iso) -> int:
+    try:
+        return int(datetime.fromisoformat(iso).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+class ActivityIndex:
+    def __init__(self):
+        self._order = []    # відсортовані (час, uid)
+        self._at = {}       # uid -> час останньої активності
+
+    def __len__(self):
+        return len(self._order)
+
+    def load(self, pairs):
+        # одноразово при старті: (uid, час) у будь-якому порядку
+        for uid, at in pairs:
+            if at > self._at.get(uid, 0):
+                self._at[uid] = at
+        self._order = sorted((at, uid) for uid, at in self._at.items())
+
+    def seen(self, uid: str, at: int):
+        old = self._at.get(uid)
+        if old is not None:
+            if at <= old:
+                return
+            del self._order[bisect_left(self._order, (old, uid))]
+        self._at[uid] = at
+        insort(self._order, (at, uid))
+
+    def between(self, lo: float, hi: float):
+        # uid, чия остання активність у [lo, hi), найдавніші першими
+        return [uid for _, uid in self._order[bisect_left(self._order, (lo,)):bisect_left(self._order, (hi,))]]
+
+
+async def send_paced(outbox, messages, rate: float, window: int = 20) -> dict:
+    """messages — async-ітератор (chat_id, text); не швидше rate/с і не більше window одночасно."""
+    bucket = TokenBucket(rate, 1)
+    counts = {"sent": 0, "blocked": 0, "failed": 0}
+    inflight = set()
+
+    def settle(fut):
+        inflight.discard(fut)
+        if fut.cancelled():
+            return
+        exc = fut.exception()
+        key = "sent" if exc is None else "blocked" if isinstance(exc, TelegramForbiddenError) else "failed"
+        counts[key] += 1
+
+    try:
+        async for chat_id, text in messages:
+            while len(inflight) >= window:
+                await asyncio.wait(set(inflight), return_when=asyncio.FIRST_COMPLETED)
+            # після 429 чекаємо разом з Outbound
+            flood = outbox.flood_until - time.monotonic()
+            if flood > 0:
+                await asyncio.sleep(flood)
+            await bucket.take()
+            fut = outbox.send_message(chat_id, text, priority=PRIO_BULK)
+            inflight.add(fut)
+            fut.add_done_callback(settle)
+        if inflight:
+            await asyncio.wait(set(inflight))
+    except asyncio.CancelledError:
+        for fut in list(inflight):
+            fut.cancel()
+        raise
+    return counts
+
+
+class Reminders:
+    def __init__(self, outbox, idle_days: float, rate: float = 10, window: int = 20, owns=None):
+        self.outbox = outbox
+        self.idle = idle_days * 86400
+        self.rate = rate
+        self.window = window
+        self.owns = owns or (lambda uid: True)    # у кластері — лише гравці цього процесу
+        self.activity = ActivityIndex()
+        self.debtors = set()
+
+    def load(self, last_reports, registrations, debts):
+        # активність — останній звіт або підтвердження оплати
+        registrations = registrations.export() if isinstance(registrations, CachedSection) else registrations
+        debts = debts.export() if isinstance(debts, CachedSection) else debts
+        approved = ((uid, _stamp(reg.get("approved_at"))) for uid, reg in registrations.items() if reg.get("approved"))
+        self.activity.load((uid, at) for uid, at in itertools.chain(last_reports, approved) if at and self.owns(uid))
+        self.debtors = {uid for uid, debt in debts.items() if debt > 0 and self.owns(uid)}
+
+    def seen(self, uid: str, at: int = None):
+        if self.owns(uid):
+            self.activity.seen(uid, at or int(time.time()))
+
+    def debt_changed(self, uid: str, debt: int):
+        if debt > 0 and self.owns(uid):
+            self.debtors.add(uid)
+        else:
+            self.debtors.discard(uid)
+
+    def idle_candidates(self, since, now):
+        cutoff = now - self.idle
+        # перший запуск: не будимо тих, хто мовчить уже понад дві паузи
+        lo = since - self.idle if since else cutoff - self.idle
+        return self.activity.between(lo, cutoff)
+
+    async def _run(self, uids, compose) -> dict:
+        # compose(uid) -> текст або None (нагадування вже не потрібне)
+        skipped = 0
+
+        async def messages():
+            nonlocal skipped
+            for uid in uids:
+                text = await compose(uid)
+                if text:
+                    yield int(uid), text
+                else:
+                    skipped += 1
+
+        counts = await send_paced(self.outbox, messages(), self.rate, self.window)
+        return {"candidates": len(uids), "skipped": skipped, **counts}
+
+    async def remind_debts(self, since, now, compose) -> dict:
+        return await self._run(sorted(self.debtors, key=int), compose)
+
+    async def nudge_idle(self, since, now, compose) -> dict:
+        return await self._run(self.idle_candidates(since, now), compose)
@@ -0,0 +1,80 @@
+# reports.py
+# Реєстр фото-звітів: історія кожного гравця + індекс повторів.
+#
+# db["reports"][uid] — список звітів гравця (найстаріший першим, не більше
+# per_player): file_id для повторної відправки без завантаження, розмір для
+# адмінки, file_unique_id найбільшого розміру — для пошуку повторів. Індекс
+# file_unique_id -> (uid, час) тримається в пам'яті й оновлюється точково.
+import time
+
+from storage import CachedSection
+
+
+def pick_size(photos, max_side: int = 0):
+    # найбільший PhotoSize, що вміщається в max_side (0 — без обмеження)
+    if max_side <= 0:
+        return photos[-1]
+    fit = [p for p in photos if max(p.width, p.height) <= max_side]
+    return fit[-1] if fit else photos[0]
+
+
+class ReportRegistry:
+    def __init__(self, section, touch, per_player: int = 100, read=None):
+        self.section = section      # db["reports"]: uid -> [{"u","f","t","k","s","at","a","st"}]
+        self.touch = touch          # touch(uid)
+        self.per_player = per_player
+        self.read = read            # read(uid) -> список повз кеш (кластер: гравець іншого процесу); блокуючий, не з loop
+        self.index = {}             # file_unique_id -> (uid, at)
+
+    def __len__(self):
+        return len(self.index)
+
+    def build(self):
+        # -> [(uid, час останнього звіту)] — для індексу активності
+        rows = self.section.export() if isinstance(self.section, CachedSection) else self.section
+        last = []
+        for uid, reports in rows.items():
+            for r in reports:
+                self.index[r["u"]] = (uid, r["at"])
+            if reports:
+                last.append((uid, reports[-1]["at"]))
+        return last
+
+    def find(self, unique_id: str):
+        return self.index.get(unique_id)
+
+    def add(self, uid: str, unique_id: str, file_id: str, thumb_id: str, kind: str, stitches: int,
+            token: str = None) -> dict:
+        entry = {"u": unique_id, "f": file_id, "k": kind, "s": stitches, "at": int(time.time())}
+        if thumb_id != file_id:
+            entry["t"] = thumb_id
+        if token:
+            entry["a"] = token
+        reports = self.section.setdefault(uid, [])
+        reports.append(entry)
+        for old in reports[:-self.per_player]:
+            # індекс тримаємо лише для збережених звітів
+            if self.index.get(old["u"], (None,))[0] == uid:
+                del self.index[old["u"]]
+        del reports[:-self.per_player]
+        self.index[unique_id] = (uid, entry["at"])
+        self.touch(uid)
+        return entry
+
+    def set_status(self, uid: str, token: str, status: str):
+        # рішення адміна по картці; шукаємо з кінця — свіжі звіти вирішуються першими
+        for entry in reversed(self.section.get(uid, ())):
+            if entry.get("a") == token:
+                entry["st"] = status
+                self.touch(uid)
+                return True
+        return False
+
+    def page(self, uid: str, page: int, size: int, reports: list = None):
+        # (звіти сторінки від найновішого, кількість сторінок); reports — уже прочитані через read()
+        if reports is None:
+            reports = self.section.get(uid, [])
+        pages = max(1, -(-len(reports) // size))
+        page = min(max(page, 1), pages)
+        end = len(reports) - (page - 1) * size
+        return list(reversed(reports[max(0, end - size):end])), pages
@@ -0,0 +1,116 @@
+# scheduler.py
+# Періодичні фонові задачі всередині процесу бота.
+#
+# Кожна задача має інтервал; час наступного і попереднього запуску пишеться на
+# диск, тож перезапуск (або сон сервісу на Render) не скидає розклад: задача,
+# яку проспали, виконується один раз одразу після старту, а не стільки разів,
+# скільки пропущено. Задачі йдуть по черзі в одній asyncio-задачі й самі
+# віддають керування loop — обробка вебхука не чекає на них.
+import json
+import time
+import asyncio
+import logging
+
+from storage import atomic_write
+
+
+def _every(seconds: float) -> str:
+    if seconds >= 86400:
+        return f"{seconds / 86400:g} дн"
+    if seconds >= 3600:
+        return f"{seconds / 3600:g} год"
+    return f"{seconds / 60:g} хв"
+
+
+class Scheduler:
+    def __init__(self, path: str):
+        self.path = path
+        self.jobs = {}          # назва -> (інтервал у с, async fn(since, now) -> dict | None)
+        self.state = {}         # назва -> {"next", "last", "result"}
+        self._task = None
+        self._wake = None
+
+    def add(self, name: str, every: float, fn):
+        # every <= 0 — задачу вимкнено
+        if every > 0:
+            self.jobs[name] = (every, fn)
+
+    # ---------- стан ----------
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+        now = time.time()
+        for name, (every, _) in self.jobs.items():
+            # нова задача вперше запускається через інтервал, а не в мить деплою
+            self.state.setdefault(name, {"next": now + every, "last": None, "result": None})
+        return self.state
+
+    async def _save(self):
+        data = json.dumps(self.state, ensure_ascii=False).encode("utf-8")
+        await asyncio.get_running_loop().run_in_executor(None, atomic_write, self.path, data)
+
+    # ---------- цикл ----------
+    def start(self):
+        if not self.jobs:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="scheduler")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def run_soon(self, name: str) -> bool:
+        # ручний запуск (адмін-команда): задача піде в наступному проході циклу
+        if name not in self.jobs or self._wake is None:
+            return False
+        self.state[name]["next"] = time.time()
+        self._wake.set()
+        return True
+
+    async def _run(self):
+        while True:
+            name = min(self.jobs, key=lambda n: self.state[n]["next"])
+            delay = self.state[name]["next"] - time.time()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            every, fn = self.jobs[name]
+            st = self.state[name]
+            now = time.time()
+            t0 = time.monotonic()
+            try:
+                result = await fn(st["last"], now) or {}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(f"job {name} failed")
+                result = {"error": f"{type(e).__name__}: {e}"}
+            result["seconds"] = round(time.monotonic() - t0, 2)
+            st.update(last=now, next=now + every, result=result)
+            logging.info(f"⏰ job {name}: {result}")
+            await self._save()
+
+    def text(self) -> str:
+        if not self.jobs:
+            return "⏰ Фонових задач немає."
+        lines = ["⏰ Розклад:"]
+        for name, (every, _) in self.jobs.items():
+            st = self.state.get(name) or {}
+            nxt = time.strftime("%d.%m %H:%M", time.localtime(st["next"])) if st.get("next") else "—"
+            last = time.strftime("%d.%m %H:%M", time.localtime(st["last"])) if st.get("last") else "—"
+            lines.append(f"• {name}: кожні {_every(every)} | востаннє {last} {st.get('result') or ''} | далі {nxt}")
+        return "\n".join(lines)
@@ -0,0 +1,734 @@
+# storage.py
+# Сховище стану гри: знімок (snapshot) + журнал дрібних змін (append-only).
+#
+# Кожна зміна — один рядок JSON у журналі: {"s": розділ, "k": ключ, "v": нове значення}
+# (без "v" — ключ видалено). Раз на N записів поточний стан записується у знімок
+# (атомарно через tmp + os.replace), а старі журнали видаляються.
+# На старті: знімок + програвання журналів, новіших за знімок.
+#
+# Знімок — звичайний JSON, але кожен запис у ньому на окремому рядку: компакція
+# збирає новий знімок у потоці запису з попереднього і закритих журналів,
+# розбираючи їх по рядку, — без одного довгого json.dumps/loads, що тримав би GIL.
+import os
+import re
+import json
+import heapq
+import itertools
+import time
+import logging
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+
+SECTIONS = ("pending", "registrations", "stats", "progress", "inventory", "debts", "reports", "rolls", "games",
+            "actions")
+# розділи, де ключ — uid гравця (підтягуються разом у prefetch); actions — за id картки
+USER_SECTIONS = SECTIONS[:9]
+
+_MISSING = object()
+_EVICTED = object()
+
+
+def empty_db():
+    return {s: {} for s in SECTIONS}
+
+
+def atomic_write(path: str, data):
+    # data — bytes або ітерація шматків bytes (великий знімок пишеться потоком)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        if isinstance(data, (bytes, bytearray)):
+            f.write(data)
+        else:
+            f.writelines(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    # фіксуємо сам rename у каталозі (де це підтримується)
+    try:
+        dfd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+    except OSError:
+        pass
+
+
+def _dumps(val) -> str:
+    return json.dumps(val, ensure_ascii=False, separators=(",", ":"))
+
+
+def snapshot_chunks(gen: int, sections: dict):
+    # sections: {розділ: {ключ: JSON-текст значення}} -> шматки файлу знімка, запис на рядок
+    yield f'{{"_gen":{gen}'.encode("utf-8")
+    for name, rows in sections.items():
+        yield f",\n{_dumps(name)}:{{".encode("utf-8")
+        sep = "\n"
+        for key, raw in rows.items():
+            yield f"{sep}{_dumps(key)}:{raw}".encode("utf-8")
+            sep = ",\n"
+        yield b"\n}"
+    yield b"}\n"
+
+
+_SNAPSHOT_HEAD = re.compile(r'\{"_gen":(\d+)[,}]\n?')
+
+
+def read_snapshot(path: str):
+    # -> (номер, {розділ: {ключ: JSON-текст}}); значення не розбираються — лише ключі
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return 0, {}
+    with f:
+        head = _SNAPSHOT_HEAD.fullmatch(f.readline())
+        if head is None:
+            # знімок старого вигляду — один рядок; розбираємо цілком
+            f.seek(0)
+            data = json.load(f)
+            gen = int(data.pop("_gen", 0))
+            return gen, {name: {key: _dumps(val) for key, val in rows.items()} for name, rows in data.items()}
+        sections = {}
+        rows = None
+        decoder = json.JSONDecoder()
+        for line in f:
+            line = line.rstrip("\n")
+            if line in ("}", "},", "}}"):
+                rows = None
+                continue
+            key, end = decoder.raw_decode(line)
+            if rows is None:
+                rows = sections[key] = {}       # заголовок розділу: "назва":{
+            else:
+                raw = line[end + 1:]
+                rows[key] = raw[:-1] if raw.endswith(",") else raw
+        return int(head.group(1)), sections
+
+
+class JournalStore:
+    """Знімок у `path` + журнали `path.journal.<gen>`.
+
+    Знімок містить поле "_gen": усі журнали з меншим номером уже в нього увійшли.
+    """
+
+    def __init__(self, path: str, compact_every: int = 500, views=None, cache_size: int = 5000):
+        self.path = path
+        self.compact_every = max(1, compact_every)
+        self.views = views              # views(db) -> {розділ: CachedSection} замість dict у пам'яті
+        self.cache_size = cache_size
+        self.db = empty_db()
+        self.gen = 0
+        self.records = 0          # записів у поточному журналі
+        self.bytes_written = 0    # для діагностики
+        self._dirty = {}          # (section, key) -> None, зберігає порядок
+        self._journal = None
+        self._compactor = None
+
+    # ---------- службове ----------
+    def _journal_path(self, gen: int) -> str:
+        return f"{self.path}.journal.{gen}"
+
+    def _journal_gens(self):
+        base = os.path.basename(self.path) + ".journal."
+        folder = os.path.dirname(self.path) or "."
+        gens = []
+        if not os.path.isdir(folder):
+            return gens
+        for name in os.listdir(folder):
+            if name.startswith(base) and name[len(base):].isdigit():
+                gens.append(int(name[len(base):]))
+        return sorted(gens)
+
+    def _apply(self, rec: dict):
+        sec = self.db.setdefault(rec["s"], {})
+        if "v" in rec:
+            sec[rec["k"]] = rec["v"]
+        else:
+            sec.pop(rec["k"], None)
+
+    def _open_journal(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._journal = open(self._journal_path(self.gen), "ab")
+
+    # ---------- API ----------
+    def exists(self) -> bool:
+        return os.path.exists(self.path) or bool(self._journal_gens())
+
+    def load(self):
+        self.db = empty_db()
+        self.gen = 0
+        legacy = False
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                legacy = _SNAPSHOT_HEAD.fullmatch(f.readline()) is None
+                f.seek(0)
+                data = json.load(f)
+            self.gen = int(data.pop("_gen", 0))
+            for sec, rows in data.items():
+                self.db[sec] = rows
+
+        replayed = 0
+        for g in self._journal_gens():
+            jp = self._journal_path(g)
+            if g < self.gen:
+                # залишок після компакції, що не встигла прибрати
+                os.remove(jp)
+                continue
+            with open(jp, "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # обірваний хвіст після аварійної зупинки
+                        logging.warning("journal %s: torn record skipped", jp)
+                        break
+                    self._apply(rec)
+                    replayed += 1
+
+        if self.views is not None:
+            self.db.update(self.views(self.db))
+        if replayed or legacy:
+            if replayed:
+                logging.info("journal: replayed %d records", replayed)
+            # починаємо з чистого аркуша, щоб не дописувати після обірваного рядка;
+            # однорядковий знімок переписуємо порядково, поки loop ще не обслуговує апдейти
+            self.compact(wait=True)
+        else:
+            self._open_journal()
+        return self.db
+
+    def mark(self, section: str, key: str):
+        self._dirty[(section, key)] = None
+
+    def collect(self):
+        # серіалізує позначені зміни; викликати з того ж потоку, що змінює db
+        for section in self.db.values():
+            if isinstance(section, CachedSection):
+                section.trim(self.cache_size, self._dirty)
+        if not self._dirty:
+            return None
+        dirty, self._dirty = self._dirty, {}
+        lines = []
+        for sec, key in dirty:
+            section = self.db.get(sec, {})
+            if isinstance(section, CachedSection):
+                val = section.pending(key)
+                if val is _EVICTED:
+                    continue
+                section.commit(key, val)
+            else:
+                val = section.get(key, _MISSING)
+            rec = {"s": sec, "k": key} if val is _MISSING else {"s": sec, "k": key, "v": val}
+            lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+        return len(lines), ("\n".join(lines) + "\n").encode("utf-8")
+
+    def write(self, batch) -> int:
+        # дописує зібране у журнал (можна з окремого потоку)
+        count, data = batch
+        if self._journal is None:
+            self._open_journal()
+        self._journal.write(data)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self.records += count
+        self.bytes_written += len(data)
+        return len(data)
+
+    def need_compact(self) -> bool:
+        return self.records >= self.compact_every
+
+    def snapshot(self):
+        # знімок стану саме на цей момент разом із номером наступного журналу (синхронна компакція)
+        new_gen = self.gen + 1
+        sections = {}
+        for name, sec in self.db.items():
+            plain = sec.export() if isinstance(sec, CachedSection) else sec
+            sections[name] = {key: _dumps(val) for key, val in plain.items()}
+        return new_gen, b"".join(snapshot_chunks(new_gen, sections))
+
+    def rebuild_snapshot(self, new_gen: int):
+        # знімок із файлів, а не з пам'яті: попередній знімок + журнали до new_gen.
+        # Для AsyncWriter: іде в потоці запису, loop тим часом змінює db як завжди
+        gen, found = read_snapshot(self.path)
+        sections = {name: {} for name in SECTIONS}
+        sections.update(found)
+        for g in self._journal_gens():
+            if not gen <= g < new_gen:
+                continue
+            with open(self._journal_path(g), "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break       # обірваний хвіст — так само, як у load()
+                    rows = sections.setdefault(rec["s"], {})
+                    if "v" in rec:
+                        rows[rec["k"]] = _dumps(rec["v"])
+                    else:
+                        rows.pop(rec["k"], None)
+        return snapshot_chunks(new_gen, sections)
+
+    def switch_journal(self, new_gen: int):
+        if self._journal is not None:
+            self._journal.close()
+        self.gen = new_gen
+        self.records = 0
+        self._open_journal()
+
+    def write_snapshot(self, new_gen: int, data):
+        try:
+            atomic_write(self.path, data)
+            for g in self._journal_gens():
+                if g < new_gen:
+                    os.remove(self._journal_path(g))
+        except Exception:
+            logging.exception("snapshot write failed")
+
+    def flush(self) -> int:
+        batch = self.collect()
+        if batch is None:
+            return 0
+        written = self.write(batch)
+        if self.need_compact():
+            self.compact()
+        return written
+
+    def compact(self, wait: bool = False):
+        if self._compactor is not None and self._compactor.is_alive():
+            if not wait:
+                return  # попередня компакція ще пише знімок
+            self._compactor.join()
+
+        new_gen, data = self.snapshot()
+        self.switch_journal(new_gen)
+        self._compactor = threading.Thread(
+            target=self.write_snapshot, args=(new_gen, data), name="db-compact", daemon=True
+        )
+        self._compactor.start()
+        if wait:
+            self._compactor.join()
+
+    def close(self):
+        self.flush()
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class CachedSection(MutableMapping):
+    """Розділ стану, що поводиться як dict із рядковими uid, але тримає в пам'яті
+    лише LRU-кеш нещодавно прочитаних гравців; решта живе в "джерелі"
+    (таблиця SQLite, компактні записи гравців). _MISSING у кеші — "точно немає".
+
+    Змінені значення лишаються в кеші, доки store не забере їх при collect().
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cache = OrderedDict()
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _keys(self):
+        raise NotImplementedError
+
+    def _fetch(self, key):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        val = self._load(key)
+        self.cache[key] = val
+        return val
+
+    def pending(self, key):
+        # значення для запису: з кешу, без звернення до джерела
+        return self.cache.get(key, _EVICTED)
+
+    def commit(self, key, value):
+        # переносить записане значення у джерело (для SQLite це робить транзакція)
+        pass
+
+    def peek(self, key, default=None):
+        # значення без запису в кеш (для обходу всіх гравців)
+        val = self.cache[key] if key in self.cache else self._load(key)
+        return default if val is _MISSING else val
+
+    def export(self) -> dict:
+        # повний розділ як звичайний dict (для знімка), не засмічуючи кеш
+        out = {}
+        for key in self:
+            val = self.peek(key, _MISSING)
+            if val is not _MISSING:
+                out[key] = val
+        return out
+
+    def __getitem__(self, key):
+        val = self._fetch(key)
+        if val is _MISSING:
+            raise KeyError(key)
+        return val
+
+    def __setitem__(self, key, value):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+
+    def __delitem__(self, key):
+        if self._fetch(key) is _MISSING:
+            raise KeyError(key)
+        self.cache[key] = _MISSING
+
+    def __contains__(self, key):
+        return self._fetch(key) is not _MISSING
+
+    def __iter__(self):
+        # ключі з джерела + ще не записані нові; видалені в кеші пропускаємо
+        seen = set()
+        for key in self._keys():
+            seen.add(key)
+            if self.cache.get(key) is not _MISSING:
+                yield key
+        for key, val in list(self.cache.items()):
+            if key not in seen and val is not _MISSING:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def trim(self, limit: int, keep):
+        # витісняємо найдавніші записи, крім тих, що ще чекають на запис
+        excess = len(self.cache) - limit
+        if excess <= 0:
+            return
+        victims = []
+        for key in self.cache:
+            if (self.name, key) not in keep:
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del self.cache[key]
+
+
+class SqliteSection(CachedSection):
+    # розділ поверх таблиці `<section>(uid INTEGER PRIMARY KEY, data TEXT)`
+    def __init__(self, store: "SqliteStore", name: str):
+        super().__init__(name)
+        self.store = store
+
+    def _load(self, key):
+        row = self.store.read_row(self.name, key)
+        return _MISSING if row is None else json.loads(row)
+
+    def _keys(self):
+        return (str(uid) for uid in self.store.iter_keys(self.name))
+
+
+class SqliteStore:
+    """Той самий інтерфейс, що й JournalStore, але кожен гравець — окремі рядки в SQLite.
+
+    Читання — з окремого з'єднання (WAL дозволяє читати паралельно з записом),
+    запис змін одного апдейта — однією транзакцією.
+    """
+
+    def __init__(self, path: str, cache_size: int = 5000, import_from: str = None):
+        self.path = path
+        self.cache_size = cache_size
+        self.import_from = import_from
+        self.bytes_written = 0
+        self.db = {}
+        self._dirty = {}
+        self._rconn = None
+        self._wconn = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # у кластері (cluster.py) в одну базу пишуть кілька процесів — чекаємо, а не падаємо
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    def _create_tables(self, names):
+        for name in names:
+            self._wconn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (uid INTEGER PRIMARY KEY, data TEXT NOT NULL)')
+
+    def load(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._wconn = self._connect()
+        self._create_tables(SECTIONS)
+        self._rconn = self._connect()
+        self.db = {name: SqliteSection(self, name) for name in SECTIONS}
+
+        src = JournalStore(self.import_from) if self.import_from else None
+        if src is not None and src.exists() and self.is_empty():
+            count = self.import_db(src.load())
+            logging.info("sqlite: migrated %d rows from %s", count, self.import_from)
+        return self.db
+
+    def is_empty(self) -> bool:
+        return all(not self._rconn.execute(f'SELECT 1 FROM "{name}" LIMIT 1').fetchall() for name in SECTIONS)
+
+    def import_db(self, data: dict) -> int:
+        count = 0
+        self._create_tables(data)
+        self._wconn.execute("BEGIN IMMEDIATE")
+        for name, rows in data.items():
+            self._wconn.executemany(
+                f'INSERT OR REPLACE INTO "{name}" (uid, data) VALUES (?, ?)',
+                ((int(k), json.dumps(v, ensure_ascii=False)) for k, v in rows.items()),
+            )
+            count += len(rows)
+        self._wconn.execute("COMMIT")
+        return count
+
+    # ---------- читання ----------
+    # курсори вичерпуємо до кінця: відкритий запит тримає старий знімок WAL
+    def read_row(self, name: str, key: str):
+        rows = self._rconn.execute(f'SELECT data FROM "{name}" WHERE uid = ?', (int(key),)).fetchall()
+        return rows[0][0] if rows else None
+
+    def iter_keys(self, name: str, batch: int = 500, after: int = None):
+        # посторінково за uid, без довгоживучого курсора; after — продовжити з місця
+        last = after
+        while True:
+            if last is None:
+                rows = self._rconn.execute(f'SELECT uid FROM "{name}" ORDER BY uid LIMIT ?', (batch,)).fetchall()
+            else:
+                rows = self._rconn.execute(
+                    f'SELECT uid FROM "{name}" WHERE uid > ? ORDER BY uid LIMIT ?', (last, batch)
+                ).fetchall()
+            if not rows:
+                return
+            for (uid,) in rows:
+                yield uid
+            last = rows[-1][0]
+
+    def iter_rows(self, name: str, batch: int = 500, after: int = None, conn=None):
+        # як iter_keys, але разом із даними і повз кеш розділу
+        conn = conn or self._rconn
+        last = after
+        while True:
+            if last is None:
+                rows = conn.execute(f'SELECT uid, data FROM "{name}" ORDER BY uid LIMIT ?', (batch,)).fetchall()
+            else:
+                rows = conn.execute(
+                    f'SELECT uid, data FROM "{name}" WHERE uid > ? ORDER BY uid LIMIT ?', (last, batch)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    def iter_joined(self, names, batch: int = 2000):
+        # (uid, {розділ: сирий JSON | None}) за зростанням uid — злиття кількох розділів
+        # без завантаження жодного цілком; власне з'єднання, як у dump_section
+        conn = self._connect()
+        try:
+            def tagged(i, name):
+                for uid, raw in self.iter_rows(name, batch=batch, conn=conn):
+                    yield uid, i, raw
+            streams = [tagged(i, name) for i, name in enumerate(names)]
+            for uid, group in itertools.groupby(heapq.merge(*streams), key=lambda r: r[0]):
+                rows = dict.fromkeys(names)
+                for _, i, raw in group:
+                    rows[names[i]] = raw
+                yield str(uid), rows
+        finally:
+            conn.close()
+
+    def dump_section(self, name: str) -> dict:
+        # повний розділ як dict; власне з'єднання — можна викликати з будь-якого потоку
+        conn = self._connect()
+        try:
+            return {str(uid): json.loads(data) for uid, data in self.iter_rows(name, batch=5000, conn=conn)}
+        finally:
+            conn.close()
+
+    def fetch_user(self, key: str, names=USER_SECTIONS):
+        # усі розділи одного гравця за раз (викликається з потоку запису)
+        out = {}
+        for name in names:
+            rows = self._wconn.execute(f'SELECT data FROM "{name}" WHERE uid = ?', (int(key),)).fetchall()
+            out[name] = rows[0][0] if rows else None
+        return out
+
+    def fill(self, key: str, rows: dict):
+        for name, raw in rows.items():
+            section = self.db[name]
+            if key not in section.cache:
+                section.cache[key] = _MISSING if raw is None else json.loads(raw)
+
+    # ---------- запис ----------
+    def mark(self, section: str, key: str):
+        self._dirty[(section, key)] = None
+
+    def collect(self):
+        # попередня порція вже записана — можна відпускати зайве з кешу
+        for section in self.db.values():
+            section.trim(self.cache_size, self._dirty)
+        if not self._dirty:
+            return None
+        dirty, self._dirty = self._dirty, {}
+        ops = []
+        for name, key in dirty:
+            val = self.db[name].pending(key)
+            if val is _EVICTED:
+                continue  # запис уже витіснено — змін, про які ми знаємо, немає
+            if val is _MISSING:
+                ops.append((name, int(key), None))
+            else:
+                ops.append((name, int(key), json.dumps(val, ensure_ascii=False, separators=(",", ":"))))
+        return len(ops), ops
+
+    def write(self, batch) -> int:
+        _, ops = batch
+        written = 0
+        self._wconn.execute("BEGIN IMMEDIATE")
+        try:
+            for name, uid, data in ops:
+                if data is None:
+                    self._wconn.execute(f'DELETE FROM "{name}" WHERE uid = ?', (uid,))
+                else:
+                    self._wconn.execute(f'INSERT OR REPLACE INTO "{name}" (uid, data) VALUES (?, ?)', (uid, data))
+                    written += len(data)
+            self._wconn.execute("COMMIT")
+        except Exception:
+            self._wconn.execute("ROLLBACK")
+            raise
+        self.bytes_written += written
+        return written
+
+    def need_compact(self) -> bool:
+        return False
+
+    def flush(self) -> int:
+        batch = self.collect()
+        return 0 if batch is None else self.write(batch)
+
+    def close(self):
+        if self._wconn is not None:
+            self.flush()
+            self._wconn.close()
+            self._rconn.close()
+            self._wconn = self._rconn = None
+
+
+def migrate(json_path: str, sqlite_path: str) -> int:
+    src = JournalStore(json_path)
+    dst = SqliteStore(sqlite_path)
+    dst.load()
+    try:
+        return dst.import_db(src.load())
+    finally:
+        dst.close()
+
+
+class AsyncWriter:
+    """Окрема задача-писач для event loop.
+
+    Обробники лише позначають зміни та викликають request_flush(); серіалізація
+    змінених рядків відбувається в loop (узгоджений стан), а запис на диск і
+    компакція (знімок із файлів, rebuild_snapshot) — в окремому потоці.
+    Усі запити, що надійшли до пробудження задачі, зливаються в один запис.
+    """
+
+    def __init__(self, store: JournalStore):
+        self.store = store
+        self.flushes = 0
+        self.observe = None       # observe(секунди, байти) після кожного запису — для метрик
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-io")
+        self._wake = None
+        self._task = None
+
+    async def _io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def load(self):
+        return await self._io(self.store.load)
+
+    async def read(self, fn, *args):
+        # читання в потоці запису: бачить усе вже записане і не блокує loop
+        return await self._io(fn, *args)
+
+    async def prefetch(self, key: str):
+        # для SQLite: підтягуємо рядки гравця заздалегідь, поза event loop
+        if not hasattr(self.store, "fetch_user"):
+            return
+        if all(key in self.store.db[name].cache for name in USER_SECTIONS):
+            return
+        rows = await self._io(self.store.fetch_user, key)
+        self.store.fill(key, rows)
+
+    async def prefetch_row(self, name: str, key: str):
+        # один рядок не гравцевого розділу (картка в "actions") — так само поза loop
+        if not hasattr(self.store, "fetch_user") or key in self.store.db[name].cache:
+            return
+        self.store.fill(key, await self._io(self.store.fetch_user, key, (name,)))
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="db-writer")
+
+    def request_flush(self):
+        if self._wake is None:
+            # loop ще не запущено (імпорт, тести) — пишемо синхронно
+            self.store.flush()
+            return
+        self._wake.set()
+
+    async def flush(self):
+        t0 = time.perf_counter()
+        batch = self.store.collect()
+        if batch is not None:
+            written = await self._io(self.store.write, batch)
+            self.flushes += 1
+            if self.observe is not None:
+                self.observe(time.perf_counter() - t0, written)
+        if self.store.need_compact():
+            await self._io(self._rotate, self.store.gen + 1)
+
+    def _rotate(self, new_gen: int):
+        # усе зібране вже в старому журналі (той самий потік) — закриваємо його і збираємо знімок
+        self.store.switch_journal(new_gen)
+        self.store.write_snapshot(new_gen, self.store.rebuild_snapshot(new_gen))
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("db flush failed")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await self._io(self.store.close)
+        self._executor.shutdown(wait=True)
+        self._wake = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    # одноразова міграція: python storage.py migrate game_db.json game_db.sqlite3
+    if len(sys.argv) == 4 and sys.argv[1] == "migrate":
+        logging.basicConfig(level=logging.INFO)
+        print(f"migrated {migrate(sys.argv[2], sys.argv[3])} rows")
+    else:
+        print("usage: python storage.py migrate <game_db.json> <game_db.sqlite3>")
+        sys.exit(2)
@@ -0,0 +1,25 @@
+# webhook.py
+# Встановлення вебхука без зайвих запитів при кожному старті.
+#
+# setWebhook скидає в Telegram стан доставки і коштує запиту на старті, тож
+# спершу питаємо getWebhookInfo: якщо адреса і типи апдейтів ті самі, нічого
+# не міняємо. Вебхук при зупинці не знімається — так Telegram накопичує
+# апдейти, поки процес перезапускається, і будить сервіс наступною доставкою.
+import logging
+
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+
+async def ensure_webhook(bot, url: str, allowed_updates=ALLOWED_UPDATES) -> bool:
+    """True — вебхук довелося (пере)встановити, False — вже був такий самий."""
+    try:
+        info = await bot.get_webhook_info()
+    except Exception as e:
+        logging.warning(f"getWebhookInfo failed, setting webhook anyway: {e}")
+        info = None
+    if info is not None and info.url == url and sorted(info.allowed_updates or ()) == sorted(allowed_updates):
+        if info.last_error_message:
+            logging.info(f"webhook last error: {info.last_error_message}")
+        return False
+    await bot.set_webhook(url, allowed_updates=allowed_updates)
+    return True